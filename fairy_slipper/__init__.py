@@ -17,7 +17,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import pbr.version
+import sys
 
-__version__ = pbr.version.VersionInfo(
-    'fairy_slipper').version_string()
+
+def version_string():
+    import pbr.version
+
+    return pbr.version.VersionInfo('fairy_slipper').version_string()
+
+
+# Working out the version with pbr is by far the most expensive part
+# of importing any of the command line tools, so where the language
+# allows it only do it when __version__ is asked for.
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name == '__version__':
+            globals()['__version__'] = version = version_string()
+            return version
+        raise AttributeError(name)
+else:
+    __version__ = version_string()
@@ -21,8 +21,12 @@ from fairy_slipper.controllers import routes_inspector
 
 
 def setup_app(local_conf):
+    # Every other option names a version and the router serving it.
+    workers = local_conf.pop('workers', None)
+    if workers is not None:
+        workers = int(workers)
     return make_app(
-        routes_inspector.VersionAPIController(local_conf),
+        routes_inspector.VersionAPIController(local_conf, workers=workers),
     )
 
 
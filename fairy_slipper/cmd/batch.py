@@ -0,0 +1,130 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import fnmatch
+import logging
+import os
+from os import path
+import sys
+import time
+import traceback
+
+from fairy_slipper.cmd.timings import timer
+
+log = logging.getLogger(__name__)
+
+
+class Result(object):
+    """The outcome of converting one file.
+
+    ``value`` is whatever the conversion function returned, and
+    ``timings`` the phases it ran if the timer is enabled.
+    """
+
+    def __init__(self, filename, elapsed, error=None, value=None,
+                 timings=None):
+        self.filename = filename
+        self.elapsed = elapsed
+        self.error = error
+        self.value = value
+        self.timings = timings
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+def find_files(filenames, pattern):
+    """Expand any directories in filenames to the files matching pattern.
+
+    Files given explicitly are always kept, files found in directories
+    are returned in sorted order.
+    """
+    found = []
+    for filename in filenames:
+        if not path.isdir(filename):
+            found.append(path.abspath(filename))
+            continue
+        matches = []
+        for dirpath, dirnames, dirfiles in os.walk(filename):
+            for name in fnmatch.filter(dirfiles, pattern):
+                matches.append(path.abspath(path.join(dirpath, name)))
+        found.extend(sorted(matches))
+    return found
+
+
+def convert(task):
+    """Call function on a file, catching and recording any errors."""
+    function, filename, kwargs, timed = task
+    # The timer isn't enabled in pool workers that were spawned.
+    timer.enabled = timed
+    start = time.time()
+    with timer.file(filename) as timings:
+        try:
+            value = function(filename, **kwargs)
+        except Exception:
+            log.exception('Failed to convert %s', filename)
+            error = traceback.format_exc()
+            value = None
+        else:
+            error = None
+    return Result(filename, time.time() - start, error, value, timings)
+
+
+def run(function, filenames, jobs=1, **kwargs):
+    """Convert each file with ``function(filename, **kwargs)``.
+
+    If ``jobs`` is more than one the files are converted on a pool of
+    processes.  A failure only affects the file it happened in, the
+    results are returned in the same order as filenames.
+    """
+    tasks = [(function, filename, kwargs, timer.enabled)
+             for filename in filenames]
+    if jobs and jobs > 1 and len(tasks) > 1:
+        import multiprocessing
+
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            results = pool.map(convert, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        timer.files.extend(result.timings for result in results
+                           if result.timings)
+        return results
+    return [convert(task) for task in tasks]
+
+
+def print_summary(results, elapsed, stream=None):
+    """Print the time each file took, and the files that failed."""
+    stream = stream or sys.stdout
+    failed = [result for result in results if result.failed]
+    for result in results:
+        print('%8.2fs %s %s' % (result.elapsed,
+                                'FAILED' if result.failed else 'ok    ',
+                                result.filename),
+              file=stream)
+    print('Converted %d of %d files in %.2fs'
+          % (len(results) - len(failed), len(results), elapsed),
+          file=stream)
+    for result in failed:
+        print('', file=stream)
+        print('%s failed:' % result.filename, file=stream)
+        print(result.error, file=stream)
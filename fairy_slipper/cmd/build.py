@@ -0,0 +1,369 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+from os import path
+import time
+
+from fairy_slipper.cmd import batch
+from fairy_slipper.cmd import docbkx_to_json
+from fairy_slipper.cmd import swagger_to_rst
+from fairy_slipper.cmd import wadl_to_swagger
+
+log = logging.getLogger(__name__)
+
+
+def write_json(obj, output_dir, filename):
+    pathname = path.join(output_dir, filename)
+    log.info("Writing %s", pathname)
+    with open(pathname, 'w') as out_file:
+        json.dump(obj, out_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    return pathname
+
+
+def build_book(book, output_dir, intermediate_dir=None, examples_dir=None,
+               cache_dir=None, parse_jobs=1, schema_aliases=False,
+               chapters=None):
+    """Convert a DocBook book all the way to ReST.
+
+    The stages hand their output straight to the next one, the
+    api-ref and swagger files are only written if there is an
+    ``intermediate_dir``.  Chapters in ``chapters``, a
+    :class:`docbkx_to_json.ChapterCache`, aren't parsed again.
+    Returns the files read, the files written and the info of the
+    swagger document.
+    """
+    api_ref, inputs = docbkx_to_json.parse_book(book, parse_jobs=parse_jobs,
+                                                chapters=chapters)
+    outputs = []
+    if intermediate_dir:
+        outputs.append(write_json(
+            api_ref, intermediate_dir,
+            'api-ref-%s-%s.json' % (api_ref['service'],
+                                    api_ref['version'])))
+
+    examples_file = None
+    if examples_dir:
+        examples_file = wadl_to_swagger.examples_filename(api_ref,
+                                                          examples_dir)
+    swagger, swagger_inputs = wadl_to_swagger.api_ref_to_swagger(
+        api_ref, examples_file, cache_dir=cache_dir, parse_jobs=parse_jobs,
+        schema_aliases=schema_aliases)
+    inputs.extend(swagger_inputs)
+    if intermediate_dir:
+        outputs.append(write_json(
+            swagger, intermediate_dir,
+            '%s-%s-swagger.json' % (api_ref['service'],
+                                    api_ref['version'])))
+
+    outputs.extend(swagger_to_rst.write_rst(swagger, output_dir))
+    outputs.extend(swagger_to_rst.write_jsonschema(swagger, output_dir))
+    outputs.extend(swagger_to_rst.write_examples(swagger, output_dir))
+    outputs.extend(swagger_to_rst.write_checksums(swagger, output_dir,
+                                                  outputs))
+    return inputs, outputs, swagger['info']
+
+
+def main1(books, output_dir, jobs=1, intermediate_dir=None,
+          examples_dir=None, cache_dir=None, manifest_file=None,
+          schema_aliases=False, chapters=None):
+    """Build each book on a pool of ``jobs`` processes.
+
+    The books are independent until they are added to the shared
+    index.json, which is written by this process once they are done.
+    The chapters are kept in ``chapters``, a
+    :class:`docbkx_to_json.ChapterCache`, so the ones books share, or
+    that didn't change since the last build, are only parsed once.
+    Returns the :class:`batch.Result` of each book that was built.
+    """
+    settings = {
+        'output_dir': path.abspath(output_dir),
+        'intermediate_dir': intermediate_dir and path.abspath(
+            intermediate_dir),
+        'examples_dir': examples_dir and path.abspath(examples_dir),
+        'schema_aliases': schema_aliases,
+    }
+    manifest = None
+    if manifest_file:
+        from fairy_slipper.cmd.manifest import Manifest
+
+        manifest = Manifest(manifest_file)
+        books = manifest.outdated('build', books, settings)
+
+    for directory in (output_dir, intermediate_dir):
+        if directory and not path.isdir(directory):
+            os.makedirs(directory)
+
+    if chapters is None:
+        chapters = docbkx_to_json.ChapterCache()
+    if len(books) > 1:
+        docbkx_to_json.load_chapters(books, chapters, jobs=jobs)
+
+    # Pool workers can't start pools of their own, so the chapters and
+    # WADL files of a book are only parsed in parallel when there is
+    # one book.
+    results = batch.run(build_book, books, jobs=jobs,
+                        output_dir=output_dir,
+                        intermediate_dir=intermediate_dir,
+                        examples_dir=examples_dir,
+                        cache_dir=cache_dir,
+                        schema_aliases=schema_aliases,
+                        chapters=chapters,
+                        parse_jobs=jobs if len(books) == 1 else 1)
+
+    for result in results:
+        if result.failed:
+            if manifest:
+                manifest.forget('build', result.filename)
+            continue
+        inputs, outputs, info = result.value
+        swagger_to_rst.write_index({'info': info}, output_dir)
+        if manifest:
+            manifest.record('build', result.filename, inputs, outputs,
+                            settings)
+    if manifest:
+        manifest.save()
+    return results
+
+
+def file_state(pathname):
+    """Return what changes when a file is edited, None if it's missing."""
+    try:
+        stat = os.stat(pathname)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+class Watcher(object):
+    """Rebuild the books whose source files change.
+
+    The files each book was built from are polled for changes, and the
+    affected books are rebuilt in this process.  That keeps the parsed
+    chapters, WADL files and samples that didn't change in memory
+    between rebuilds.  Only the known files are checked on each poll, the
+    sources are searched for new books every ``scan_interval``
+    seconds.  ``kwargs`` are passed to :func:`main1`.
+    """
+
+    def __init__(self, sources, output_dir, notify_file=None,
+                 scan_interval=10.0, **kwargs):
+        self.sources = sources
+        self.output_dir = output_dir
+        self.notify_file = notify_file
+        self.scan_interval = scan_interval
+        self.kwargs = kwargs
+        self.inputs = {}
+        self.state = {}
+        self.last_scan = None
+        self.chapters = kwargs.setdefault('chapters',
+                                          docbkx_to_json.ChapterCache())
+
+    def add(self, book, inputs):
+        """Watch the files a book was built from."""
+        self.inputs[book] = inputs
+        for pathname in inputs:
+            self.state[pathname] = file_state(pathname)
+
+    def add_results(self, results):
+        for result in results:
+            if result.failed:
+                # Retry once the book, or anything it used last time,
+                # changes.
+                self.add(result.filename,
+                         self.inputs.get(result.filename, [result.filename]))
+            else:
+                self.add(result.filename, result.value[0])
+
+    def changes(self):
+        """Return the changed files and the books that need rebuilding."""
+        changed = set()
+        for pathname, state in self.state.items():
+            current = file_state(pathname)
+            if current != state:
+                changed.add(pathname)
+                self.state[pathname] = current
+        now = time.time()
+        last_scan = self.last_scan
+        if last_scan is None or now - last_scan >= self.scan_interval:
+            self.last_scan = now
+            books = docbkx_to_json.find_books(self.sources)
+            for book in set(self.inputs) - set(books):
+                del self.inputs[book]
+        else:
+            books = sorted(book for book in self.inputs
+                           if self.state.get(book) is not None)
+        return changed, [book for book in books
+                         if self.is_outdated(book, changed)]
+
+    def is_outdated(self, book, changed):
+        if book not in self.inputs:
+            return True
+        return bool(changed.intersection(self.inputs[book]))
+
+    def poll(self):
+        """Rebuild the books affected by changes since the last poll."""
+        changed, books = self.changes()
+        if not books:
+            return []
+        log.info('Rebuilding %s', ', '.join(books))
+        self.chapters.forget(changed)
+        wadl_to_swagger.loaded_samples.forget(changed)
+        wadl_to_swagger.get_cache(self.kwargs.get('cache_dir')).forget(
+            changed)
+        results = main1(books, self.output_dir, **self.kwargs)
+        # Books the manifest found to be up to date keep their inputs.
+        for book in books:
+            if book not in self.inputs:
+                self.add(book, [book])
+        self.add_results(results)
+        if results and self.notify_file:
+            with open(self.notify_file, 'a'):
+                os.utime(self.notify_file, None)
+        return results
+
+    def run(self, interval=1.0):
+        while True:
+            time.sleep(interval)
+            for result in self.poll():
+                if result.failed:
+                    print('%s failed:' % result.filename)
+                    print(result.error)
+                else:
+                    print('Rebuilt %s in %.2fs' % (result.filename,
+                                                   result.elapsed))
+
+
+def watch(sources, results, output_dir, interval=1.0, notify_file=None,
+          scan_interval=10.0, **kwargs):
+    """Rebuild books as their sources change, until interrupted."""
+    watcher = Watcher(sources, output_dir, notify_file, scan_interval,
+                      **kwargs)
+    built = set(result.filename for result in results)
+    if kwargs.get('manifest_file'):
+        from fairy_slipper.cmd.manifest import Manifest
+
+        manifest = Manifest(kwargs['manifest_file'])
+        for book in docbkx_to_json.find_books(sources):
+            if book not in built:
+                watcher.add(book, manifest.inputs('build', book) or [book])
+    watcher.add_results(results)
+    log.info('Watching %d files', len(watcher.state))
+    try:
+        watcher.run(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help="Increase verbosity (specify multiple times for more)")
+    parser.add_argument(
+        '-o', '--output-dir', action='store', default=os.curdir,
+        help="The directory to output the ReST files too.")
+    parser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        default=multiprocessing.cpu_count(),
+        help="The number of books to convert in parallel.")
+    parser.add_argument(
+        '--intermediate-dir', action='store',
+        help="Also write the api-ref and swagger JSON files to this "
+        "directory.")
+    parser.add_argument(
+        '--examples-dir', action='store',
+        help="The directory containing the <service>-examples.json "
+        "files written by fairy-slipper-tempest-log.")
+    parser.add_argument(
+        '--cache-dir', action='store',
+        help="Keep parsed WADL files in this directory to reuse them "
+        "in later runs.")
+    parser.add_argument(
+        '--schema-aliases', action='store_true',
+        help="Keep a definition for every operation when identical "
+        "schemas are merged, referring to the merged one.")
+    parser.add_argument(
+        '--manifest', action='store',
+        help="Record the files each book used in this file, and skip "
+        "the books where none of them have changed.")
+    parser.add_argument(
+        '--watch', action='store_true',
+        help="Keep running and rebuild the books whose sources change.")
+    parser.add_argument(
+        '--interval', action='store', type=float, default=1.0,
+        help="How often --watch checks for changes, in seconds.")
+    parser.add_argument(
+        '--scan-interval', action='store', type=float, default=10.0,
+        help="How often --watch looks for new books, in seconds.")
+    parser.add_argument(
+        '--notify', action='store',
+        help="Touch this file whenever --watch rebuilt a book.")
+    parser.add_argument(
+        'filename', nargs='+',
+        help="api-site checkouts or books to convert, directories are "
+        "searched for api-ref-* books")
+
+    args = parser.parse_args()
+
+    log_level = logging.WARNING
+    if args.verbose == 1:
+        log_level = logging.INFO
+    elif args.verbose >= 2:
+        log_level = logging.DEBUG
+
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    start = time.time()
+    # Watching keeps the chapters of the first build.
+    chapters = docbkx_to_json.ChapterCache()
+    results = main1(docbkx_to_json.find_books(args.filename), args.output_dir,
+                    jobs=args.jobs,
+                    chapters=chapters,
+                    intermediate_dir=args.intermediate_dir,
+                    examples_dir=args.examples_dir,
+                    cache_dir=args.cache_dir,
+                    manifest_file=args.manifest,
+                    schema_aliases=args.schema_aliases)
+    if len(results) > 1 or any(result.failed for result in results):
+        batch.print_summary(results, time.time() - start)
+    if args.watch:
+        watch(args.filename, results, args.output_dir,
+              interval=args.interval,
+              notify_file=args.notify,
+              scan_interval=args.scan_interval,
+              jobs=1,
+              intermediate_dir=args.intermediate_dir,
+              examples_dir=args.examples_dir,
+              cache_dir=args.cache_dir,
+              manifest_file=args.manifest,
+              schema_aliases=args.schema_aliases,
+              chapters=chapters)
+    elif any(result.failed for result in results):
+        return 1
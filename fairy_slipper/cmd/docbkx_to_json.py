@@ -24,9 +24,12 @@ import os
 from os import path
 import re
 import textwrap
+import time
 import xml.sax
 
-import prettytable
+from fairy_slipper.cmd import batch
+from fairy_slipper.cmd.timings import timer
+from fairy_slipper.cmd import xmlparse
 
 log = logging.getLogger(__name__)
 
@@ -273,6 +276,8 @@ CAPTION_RE = re.compile('[*`]*')
 
 class TableMixin(object):
     def visit_table(self, attrs):
+        import prettytable
+
         self.__table = prettytable.PrettyTable(hrules=prettytable.ALL)
         self.__table.header = False
 
@@ -317,7 +322,8 @@ class TableMixin(object):
             self.__table.add_row(self.__row)
 
 
-class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
+class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin,
+                               xmlparse.ElementStack):
 
     EMPHASIS = {
         'bold': '**',
@@ -327,6 +333,8 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
     def __init__(self, filename, api_parser):
         self.filename = filename
         self.api_parser = api_parser
+        self.visitors = xmlparse.dispatch_table(type(self), 'visit_')
+        self.departures = xmlparse.dispatch_table(type(self), 'depart_')
 
     def startDocument(self):
         super(APIChapterContentHandler, self).startDocument()
@@ -334,8 +342,7 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
         self.current_tag = None
 
         # general state
-        self.tag_stack = []
-        self.attr_stack = []
+        self.reset_stack()
         self.content_stack = [[]]
         self.current_emphasis = None
         self.nesting = 0
@@ -349,20 +356,10 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
     def content(self):
         return self.content_stack[-1]
 
-    def search_stack_for(self, tag_name):
-        for tag, attrs in zip(reversed(self.tag_stack),
-                              reversed(self.attr_stack)):
-            if tag == tag_name:
-                return attrs
-
-    def on_top_tag_stack(self, *args):
-        return self.tag_stack[-len(args):] == list(args)
-
     def startElement(self, name, _attrs):
         attrs = dict(_attrs)
 
-        self.tag_stack.append(name)
-        self.attr_stack.append(attrs)
+        self.push_element(name, attrs)
 
         if self.on_top_tag_stack('chapter', 'section', 'title'):
             self.content_stack.append([])
@@ -398,9 +395,9 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
             method_path = filepath + attrs['href']
             self.api_parser.method_tags[method_path] = self.current_tag['name']
 
-        fn = getattr(self, 'visit_%s' % name, None)
+        fn = self.visitors.get(name)
         if fn:
-            fn(dict(_attrs))
+            fn(self, dict(_attrs))
 
     def endElement(self, name):
         content = ''.join(self.content)
@@ -423,18 +420,18 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
             self.current_tag['summary'] = content.strip()
             self.content_stack.pop()
 
-        self.tag_stack.pop()
-        self.attr_stack.pop()
+        self.pop_element()
 
-        fn = getattr(self, 'depart_%s' % name, None)
+        fn = self.departures.get(name)
         if fn:
-            fn()
+            fn(self)
 
     def characters(self, content):
         if not content:
             return
+        listing = self.on_top_tag_stack('programlisting')
         # Fold up any white space into a single char
-        if not self.on_top_tag_stack('programlisting'):
+        if not listing:
             content = WHITESPACE_RE.sub(' ', content)
 
         if content == ' ':
@@ -446,7 +443,7 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
                 content = ' ' * self.nesting + content.strip()
             elif self.content[-1].endswith(' '):
                 content = content.strip()
-            elif (self.on_top_tag_stack('programlisting')):
+            elif listing:
                 content = '\n' + ' ' * self.nesting + content
             elif self.no_space:
                 content = '' + content.strip()
@@ -459,8 +456,7 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
             self.content.append(content)
 
     def visit_listitem(self, attrs):
-        self.nesting = len([tag for tag in self.tag_stack
-                            if tag == 'listitem']) - 1
+        self.nesting = self.count_open('listitem') - 1
         if self.nesting > 0:
             prev_nesting = self.nesting - 1
             self.base_indent = ' ' * prev_nesting + '  '
@@ -481,8 +477,7 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
         else:
             self.content.append('\n')
 
-        self.nesting = len([tag for tag in self.tag_stack
-                            if tag == 'listitem']) - 1
+        self.nesting = self.count_open('listitem') - 1
         if self.nesting > 0:
             prev_nesting = self.nesting - 1
             self.base_indent = ' ' * prev_nesting + '  '
@@ -563,10 +558,107 @@ class APIChapterContentHandler(xml.sax.ContentHandler, TableMixin):
         self.content.append('\n\n')
 
 
-class APIRefContentHandler(xml.sax.ContentHandler):
+class APIChapter(object):
+    """What a chapter adds to the api-ref description of its book."""
 
     def __init__(self, filename):
         self.filename = filename
+        self.title = None
+        self.tags = []
+        self.method_tags = {}
+        self.resource_tags = {}
+        self.file_tags = {}
+
+
+def parse_chapter(filepath):
+    chapter = APIChapter(filepath)
+    xmlparse.parse(filepath, APIChapterContentHandler(filepath, chapter))
+    return chapter
+
+
+def try_parse_chapter(filepath):
+    """Parse a chapter, returning None if that fails."""
+    try:
+        return parse_chapter(filepath)
+    except Exception:
+        log.debug('Failed to parse %s', filepath, exc_info=True)
+        return None
+
+
+def parse_chapters(filepaths, jobs=1, ignore_errors=False):
+    """Parse each chapter, on a pool of ``jobs`` processes.
+
+    The chapters are returned in the same order as filepaths.  With
+    ``ignore_errors`` a chapter that can't be parsed is None, rather
+    than stopping the others.
+    """
+    function = try_parse_chapter if ignore_errors else parse_chapter
+    if jobs and jobs > 1 and len(filepaths) > 1:
+        import multiprocessing
+
+        pool = multiprocessing.Pool(min(jobs, len(filepaths)))
+        try:
+            return pool.map(function, filepaths, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return [function(filepath) for filepath in filepaths]
+
+
+class ChapterCache(object):
+    """The chapters parsed in this process, by absolute path.
+
+    Books often include the same chapters, each of them only has to
+    be parsed once.
+    """
+
+    def __init__(self):
+        self.chapters = {}
+        self.hits = 0
+
+    def parse_all(self, filepaths, jobs=1, ignore_errors=False):
+        """Return the parsed chapter of each file.
+
+        The chapters that aren't cached are parsed with
+        :func:`parse_chapters`, a chapter that failed with
+        ``ignore_errors`` is None and isn't cached.
+        """
+        filepaths = [path.abspath(filepath) for filepath in filepaths]
+        pending = []
+        for filepath in filepaths:
+            if filepath in self.chapters:
+                self.hits += 1
+            elif filepath not in pending:
+                pending.append(filepath)
+        parsed = parse_chapters(pending, jobs=jobs,
+                                ignore_errors=ignore_errors)
+        for filepath, chapter in zip(pending, parsed):
+            if chapter is not None:
+                self.chapters[filepath] = chapter
+        return [self.chapters.get(filepath) for filepath in filepaths]
+
+    def forget(self, pathnames):
+        """Drop any of pathnames, so they are parsed again."""
+        for pathname in pathnames:
+            self.chapters.pop(path.abspath(pathname), None)
+
+
+class APIRefContentHandler(xml.sax.ContentHandler, xmlparse.ElementStack):
+    """Read a book and the chapters it includes.
+
+    The includes are collected first, the chapters are then parsed on
+    a pool of ``jobs`` processes and added in the order they were
+    included, which gives the same result as parsing them in turn.
+    They are taken from ``chapters``, a :class:`ChapterCache`, if one
+    is shared between books.  If ``include`` is false the includes are
+    only collected.
+    """
+
+    def __init__(self, filename, jobs=1, chapters=None, include=True):
+        self.filename = filename
+        self.jobs = jobs
+        self.chapters = chapters
+        self.include = include
 
     def startDocument(self):
         self.tags = []
@@ -574,25 +666,15 @@ class APIRefContentHandler(xml.sax.ContentHandler):
         self.method_tags = {}
         self.resource_tags = {}
         self.file_tags = {}
+        self.includes = []
 
         # general state
-        self.tag_stack = []
-        self.attr_stack = []
+        self.reset_stack()
         self.content = None
 
-    def search_stack_for(self, tag_name):
-        for tag, attrs in zip(reversed(self.tag_stack),
-                              reversed(self.attr_stack)):
-            if tag == tag_name:
-                return attrs
-
-    def on_top_tag_stack(self, *args):
-        return self.tag_stack[-len(args):] == list(args)
-
     def startElement(self, name, _attrs):
         attrs = dict(_attrs)
-        self.tag_stack.append(name)
-        self.attr_stack.append(attrs)
+        self.push_element(name, attrs)
         self.content = []
         if self.on_top_tag_stack('book'):
             id = attrs['xml:id']
@@ -612,12 +694,29 @@ class APIRefContentHandler(xml.sax.ContentHandler):
             filename = attrs['href']
             dir = path.dirname(self.filename)
             filepath = path.join(dir, filename)
-            ch = APIChapterContentHandler(filepath, self)
-            xml.sax.parse(filepath, ch)
+            self.includes.append(filepath)
 
     def endElement(self, name):
-        self.tag_stack.pop()
-        self.attr_stack.pop()
+        self.pop_element()
+
+    def endDocument(self):
+        if not self.include:
+            return
+        if self.chapters is None:
+            chapters = parse_chapters(self.includes, jobs=self.jobs)
+        else:
+            chapters = self.chapters.parse_all(self.includes, jobs=self.jobs)
+        for chapter in chapters:
+            self.add_chapter(chapter)
+
+    def add_chapter(self, chapter):
+        if chapter.title is not None:
+            self.title = chapter.title
+        # A cached chapter's tags can be added to other books too.
+        self.tags.extend(dict(tag) for tag in chapter.tags)
+        self.method_tags.update(chapter.method_tags)
+        self.resource_tags.update(chapter.resource_tags)
+        self.file_tags.update(chapter.file_tags)
 
     def characters(self, content):
         content = content.strip()
@@ -625,11 +724,47 @@ class APIRefContentHandler(xml.sax.ContentHandler):
             self.content.append(content)
 
 
-def main1(source_file, output_dir):
+def find_books(filenames):
+    """Return the api-ref books in api-site checkouts or directories."""
+    sources = []
+    for filename in filenames:
+        docbkx = path.join(filename, 'api-ref', 'src', 'docbkx')
+        sources.append(docbkx if path.isdir(docbkx) else filename)
+    return batch.find_files(sources, 'api-ref-*')
+
+
+def load_chapters(books, chapters, jobs=1):
+    """Parse the chapters of all the books into a :class:`ChapterCache`.
+
+    Each distinct chapter is parsed once, on a pool of ``jobs``
+    processes.  Books and chapters that fail are skipped, the error
+    comes up again when the book is converted.
+    """
+    includes = []
+    for book in books:
+        ch = APIRefContentHandler(book, include=False)
+        try:
+            xmlparse.parse(book, ch)
+        except Exception:
+            log.debug('Failed to read %s', book, exc_info=True)
+            continue
+        includes.extend(ch.includes)
+    chapters.parse_all(includes, jobs=jobs, ignore_errors=True)
+    log.info('Parsed %d chapters for %d books', len(chapters.chapters),
+             len(books))
+
+
+def parse_book(source_file, parse_jobs=1, chapters=None):
+    """Return the api-ref description of a book and the files it read.
+
+    The chapters are parsed on a pool of ``parse_jobs`` processes, or
+    taken from ``chapters`` if they are in that :class:`ChapterCache`.
+    """
     log.info('Parsing %s' % source_file)
-    ch = APIRefContentHandler(source_file)
-    xml.sax.parse(source_file, ch)
-    os.chdir(output_dir)
+    ch = APIRefContentHandler(source_file, jobs=parse_jobs,
+                              chapters=chapters)
+    with timer.phase('parse'):
+        xmlparse.parse(source_file, ch)
     output = {
         'title': ch.title,
         'service': ch.service,
@@ -639,14 +774,25 @@ def main1(source_file, output_dir):
         'file_tags': ch.file_tags,
         'resource_tags': ch.resource_tags,
     }
-    pathname = 'api-ref-%s-%s.json' % (ch.service,
-                                       ch.version)
-    with open(pathname, 'w') as out_file:
-        json.dump(output, out_file, indent=2, sort_keys=True)
+    return output, [source_file] + ch.includes
+
+
+def main1(source_file, output_dir, parse_jobs=1, chapters=None):
+    """Convert a book, returning the files read and the file written."""
+    output, inputs = parse_book(source_file, parse_jobs=parse_jobs,
+                                chapters=chapters)
+    pathname = path.join(output_dir or os.curdir,
+                         'api-ref-%s-%s.json' % (output['service'],
+                                                 output['version']))
+    with timer.phase('write'), open(pathname, 'w') as out_file:
+        json.dump(output, out_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    return inputs, [path.abspath(pathname)]
 
 
 def main():
     import argparse
+    import multiprocessing
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -657,8 +803,24 @@ def main():
         '-o', '--output-dir', action='store',
         help="The directory to output the JSON files too.")
     parser.add_argument(
-        'filename',
-        help="File to convert")
+        '-j', '--jobs', action='store', type=int,
+        default=multiprocessing.cpu_count(),
+        help="The number of chapters to parse in parallel.")
+    parser.add_argument(
+        '--manifest', action='store',
+        help="Record the files each conversion used in this file, and "
+        "skip the conversions where none of them have changed.")
+    parser.add_argument(
+        '--timings', action='store',
+        help="Write the wall time, CPU time and peak memory of each "
+        "phase of each conversion to this JSON file.")
+    parser.add_argument(
+        '--profile', action='store',
+        help="Write a cProfile dump of the conversions to this file.")
+    parser.add_argument(
+        'filename', nargs='+',
+        help="Books to convert, api-site checkouts and directories are "
+        "searched for api-ref-* books")
 
     args = parser.parse_args()
 
@@ -672,6 +834,35 @@ def main():
         level=log_level,
         format='%(asctime)s %(name)s %(levelname)s %(message)s')
 
-    filename = path.abspath(args.filename)
-
-    main1(filename, output_dir=args.output_dir)
+    from fairy_slipper.cmd import timings
+
+    if args.profile and args.jobs > 1:
+        log.info('Parsing in one process to profile it')
+        args.jobs = 1
+    filenames = find_books(args.filename)
+    if args.manifest:
+        from fairy_slipper.cmd.manifest import Manifest
+
+        tool = 'docbkx_to_json'
+        settings = {'output_dir': path.abspath(args.output_dir or os.curdir)}
+        manifest = Manifest(args.manifest)
+        filenames = manifest.outdated(tool, filenames, settings)
+    start = time.time()
+    # The chapters of all the books are parsed up front, so the ones
+    # they share are only parsed once.
+    chapters = ChapterCache()
+    with timings.collect(args.timings, args.profile):
+        if len(filenames) > 1:
+            with timer.phase('load_chapters'):
+                load_chapters(filenames, chapters, jobs=args.jobs)
+        results = batch.run(main1, filenames,
+                            output_dir=args.output_dir,
+                            parse_jobs=args.jobs,
+                            chapters=chapters)
+    if args.manifest:
+        manifest.record_results(tool, results, settings)
+        manifest.save()
+    if len(results) > 1 or any(result.failed for result in results):
+        batch.print_summary(results, time.time() - start)
+    if any(result.failed for result in results):
+        return 1
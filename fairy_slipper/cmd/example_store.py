@@ -0,0 +1,128 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+from os import path
+import shutil
+import tempfile
+
+log = logging.getLogger(__name__)
+
+# The key of a stored example, and of the store's directory in a
+# swagger document.
+STORE_KEY = 'x-example-store'
+
+EXTENSIONS = {
+    'application/json': 'json',
+    'text/plain': 'txt',
+}
+
+
+def render_example(mime, example):
+    """Return the content of the file an example is written to."""
+    if mime == 'application/json':
+        return json.dumps(example, indent=2, sort_keys=True,
+                          separators=(',', ': '))
+    return example.strip() + '\n'
+
+
+def file_mode():
+    """Return the mode a new file gets with the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def is_stored(example):
+    return isinstance(example, dict) and list(example) == [STORE_KEY]
+
+
+def link_or_copy(source, destination):
+    """Hard link source to destination, copying it if that fails."""
+    if path.lexists(destination):
+        os.unlink(destination)
+    try:
+        os.link(source, destination)
+    except (AttributeError, OSError):
+        shutil.copyfile(source, destination)
+
+
+class ExampleStore(object):
+    """Example payloads stored in files named by the hash of their content.
+
+    A stored example is replaced in the swagger document by a
+    ``{"x-example-store": "<file name>"}`` reference, so the document
+    only has to hold each payload's name.  The files hold exactly what
+    swagger_to_rst would write for the example, so it can be linked
+    into place without being parsed again.
+    """
+
+    def __init__(self, directory):
+        self.directory = path.abspath(directory)
+        if not path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def add(self, mime, example):
+        """Store an example, returning the reference to it."""
+        content = render_example(mime, example).encode('utf-8')
+        filename = '%s.%s' % (hashlib.sha256(content).hexdigest(),
+                              EXTENSIONS[mime])
+        filepath = path.join(self.directory, filename)
+        if not path.exists(filepath):
+            fd, tmp_filepath = tempfile.mkstemp(dir=self.directory,
+                                                suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(content)
+            # mkstemp makes the file private, but it's linked into the
+            # published examples.
+            os.chmod(tmp_filepath, file_mode())
+            os.rename(tmp_filepath, filepath)
+        return {STORE_KEY: filename}
+
+    def stored(self, examples):
+        """Return a copy of examples with the payloads stored."""
+        stored = {}
+        for mime, example in examples.items():
+            # Empty examples aren't shown, they stay in the document
+            # so the templates can still tell.
+            if mime in EXTENSIONS and example and not is_stored(example):
+                example = self.add(mime, example)
+            stored[mime] = example
+        return stored
+
+    def store_all(self, swagger, swagger_dir=None):
+        """Move the examples of every operation in swagger to the store.
+
+        The store is recorded relative to ``swagger_dir``, the
+        directory the document is written to, so it doesn't depend on
+        where the checkout is.  The operations' example dicts are
+        replaced rather than changed, they can be shared with the
+        parsed WADL files.
+        """
+        swagger[STORE_KEY] = path.relpath(
+            self.directory, path.abspath(swagger_dir or os.curdir)).replace(
+                os.sep, '/')
+        for operations in swagger['paths'].values():
+            for operation in operations:
+                operation['examples'] = self.stored(operation['examples'])
+                for response in operation['responses'].values():
+                    response['examples'] = self.stored(response['examples'])
@@ -0,0 +1,192 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+from os import path
+import tempfile
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+
+# The version of fairy-slipper, it's only looked up once.
+versions = []
+
+
+def hash_file(pathname):
+    """Return the sha256 of a file, or None if it can't be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(pathname, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(1 << 16), b''):
+                digest.update(block)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def tool_version():
+    if not versions:
+        import fairy_slipper
+
+        versions.append(fairy_slipper.version_string())
+    return versions[0]
+
+
+class Manifest(object):
+    """The inputs and outputs of earlier conversions.
+
+    Each conversion is a step of a tool on one source file.  It is
+    recorded with the hash of every file it read, including the ones
+    it found while converting, such as DocBook chapters, WADL files
+    and samples, along with the files it wrote and the settings that
+    affect them.  A step only has to be run again if the tool version,
+    the settings or any of those inputs changed, or an output is
+    missing.
+    """
+
+    def __init__(self, filename, version=None):
+        self.filename = path.abspath(filename)
+        self.version = version or tool_version()
+        self.hashes = {}
+        self.steps = {}
+        try:
+            with open(filename) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return
+        if manifest.get('format') == MANIFEST_FORMAT:
+            self.steps = manifest['steps']
+
+    def hash(self, pathname):
+        """Return the hash of a file, each file is only read once."""
+        if pathname not in self.hashes:
+            self.hashes[pathname] = hash_file(pathname)
+        return self.hashes[pathname]
+
+    def key(self, tool, filename):
+        return '%s:%s' % (tool, path.abspath(filename))
+
+    def is_current(self, tool, filename, settings=None):
+        """Return True if the last conversion of filename is up to date."""
+        step = self.steps.get(self.key(tool, filename))
+        if step is None:
+            return False
+        if step['version'] != self.version:
+            return False
+        if step['settings'] != (settings or {}):
+            return False
+        for pathname in step['outputs']:
+            if not path.exists(pathname):
+                log.info('Output %s is missing', pathname)
+                return False
+        for pathname, input_hash in step['inputs'].items():
+            if self.hash(pathname) != input_hash:
+                log.info('Input %s has changed', pathname)
+                return False
+        return True
+
+    def outdated(self, tool, filenames, settings=None):
+        """Return the filenames whose conversion isn't up to date."""
+        outdated = []
+        for filename in filenames:
+            if self.is_current(tool, filename, settings):
+                log.info('%s is up to date', filename)
+            else:
+                outdated.append(filename)
+        return outdated
+
+    def record(self, tool, filename, inputs, outputs, settings=None):
+        """Record a conversion of filename.
+
+        ``inputs`` are all the files that were read, a file that
+        didn't exist is recorded too, so creating it later also
+        triggers a rebuild.
+        """
+        outputs = [path.abspath(pathname) for pathname in outputs]
+        for pathname in outputs:
+            self.hashes.pop(pathname, None)
+        self.steps[self.key(tool, filename)] = {
+            'version': self.version,
+            'settings': settings or {},
+            'inputs': dict((path.abspath(pathname),
+                            self.hash(path.abspath(pathname)))
+                           for pathname in inputs),
+            'outputs': sorted(outputs),
+        }
+
+    def inputs(self, tool, filename):
+        """Return the files the last conversion of filename read."""
+        step = self.steps.get(self.key(tool, filename))
+        return list(step['inputs']) if step else []
+
+    def forget(self, tool, filename):
+        self.steps.pop(self.key(tool, filename), None)
+
+    def record_results(self, tool, results, settings=None):
+        """Record the results of a :func:`batch.run`.
+
+        The function that was run must return the ``(inputs,
+        outputs)`` of each conversion, anything after them is ignored.
+        """
+        for result in results:
+            if result.failed:
+                self.forget(tool, result.filename)
+            else:
+                inputs, outputs = result.value[:2]
+                self.record(tool, result.filename, inputs, outputs,
+                            settings)
+
+    def save(self):
+        directory = path.dirname(path.abspath(self.filename))
+        if not path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_filepath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump({'format': MANIFEST_FORMAT, 'steps': self.steps},
+                          tmp_file, indent=2, sort_keys=True)
+            os.rename(tmp_filepath, self.filename)
+        except (IOError, OSError):
+            log.warning("Failed to write manifest %s", self.filename)
+            if path.exists(tmp_filepath):
+                os.unlink(tmp_filepath)
+
+
+def convert(tool, function, filename, output_dir, manifest_file=None):
+    """Call ``function(filename, output_dir=output_dir)``.
+
+    If there is a manifest file the conversion is skipped when it is
+    up to date, otherwise it is recorded there.  The function must
+    return the ``(inputs, outputs)`` of the conversion.
+    """
+    if not manifest_file:
+        return function(filename, output_dir=output_dir)
+    settings = {'output_dir': path.abspath(output_dir or os.curdir)}
+    manifest = Manifest(manifest_file)
+    if manifest.is_current(tool, filename, settings):
+        log.info('%s is up to date', filename)
+        return
+    inputs, outputs = function(filename, output_dir=output_dir)
+    manifest.record(tool, filename, inputs, outputs, settings)
+    manifest.save()
+    return inputs, outputs
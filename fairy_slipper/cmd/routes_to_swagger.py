@@ -0,0 +1,199 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+from os import path
+import re
+import textwrap
+
+log = logging.getLogger(__name__)
+
+# Routes path variables, ``:(id)`` and ``{id:regexp}``.
+ROUTES_VAR_RE = re.compile(r':\(([^()]+)\)')
+ROUTES_REQ_RE = re.compile('{([^{}:]+):[^{}]+}')
+URL_TEMPLATE_RE = re.compile('{([^{}]+)}')
+
+
+def swagger_path(routepath):
+    """Return a routes path in swagger's template syntax."""
+    routepath = ROUTES_VAR_RE.sub(r'{\1}', routepath)
+    return ROUTES_REQ_RE.sub(r'{\1}', routepath)
+
+
+def split_docstring(doc):
+    """Return the summary and description of a docstring."""
+    if not doc:
+        return '', ''
+    doc = textwrap.dedent(doc).strip()
+    summary, _, description = doc.partition('\n\n')
+    return ' '.join(summary.split()), description.strip()
+
+
+def create_operation(route, method, controller_doc):
+    urlpath = swagger_path(route['routepath'])
+    module, _, action = route['classpath'].partition(':')
+    class_name = module.rsplit('.', 1)[-1]
+    summary, description = split_docstring(controller_doc)
+    parameters = [{'name': name,
+                   'in': 'path',
+                   'description': '',
+                   'required': True,
+                   'type': 'string'}
+                  for name in URL_TEMPLATE_RE.findall(urlpath)]
+    return {
+        'id': '%s_%s_%s' % (class_name, action, method),
+        'method': method,
+        'title': action,
+        'summary': summary,
+        'description': description,
+        'tags': [route['tag']],
+        'produces': [],
+        'consumes': [],
+        'examples': {},
+        'parameters': parameters,
+        'responses': {},
+    }
+
+
+def routes_to_swagger(routes, service, version, title=None, docs=None):
+    """Convert the routes inspector's route table into swagger.
+
+    ``docs`` maps a route classpath to the docstring of its action.
+    """
+    docs = docs or {}
+    output = {
+        'info': {
+            'version': version,
+            'title': title or service,
+            'service': service,
+            'license': {
+                "name": "Apache 2.0",
+                "url": "http://www.apache.org/licenses/LICENSE-2.0.html"
+            }
+        },
+        'paths': {},
+        'schemes': {},
+        'tags': [],
+        'basePath': {},
+        'securityDefinitions': {},
+        'host': {},
+        'definitions': {},
+        'externalDocs': {},
+        'swagger': '2.0',
+    }
+    tags = []
+    for route in routes:
+        # Tag each operation with the module the controller is in.
+        module = route['classpath'].split(':', 1)[0].rsplit('.', 1)[0]
+        route = dict(route, tag=module.rsplit('.', 1)[-1])
+        if route['tag'] not in tags:
+            tags.append(route['tag'])
+        methods = (route['conditions'] or {}).get('method') or ['GET']
+        urlpath = swagger_path(route['routepath'])
+        for method in methods:
+            operation = create_operation(route, method.lower(),
+                                         docs.get(route['classpath']))
+            output['paths'].setdefault(urlpath, []).append(operation)
+    output['tags'] = [{'name': tag, 'description': '', 'summary': ''}
+                      for tag in tags]
+    return output
+
+
+def load_routes(router, version):
+    """Run the routes inspector over a router.
+
+    Returns the route table and the docstrings of each action keyed
+    by classpath.  The docstrings are used as they are, the inspector
+    doesn't render them.
+    """
+    from fairy_slipper.controllers import routes_inspector
+
+    controller = routes_inspector.DocSpecController(version, router)
+    routes, actions = controller.find_routes()
+    docs = {}
+    for route, (api_controller, action) in zip(routes, actions):
+        docs[route['classpath']] = getattr(api_controller, action).__doc__
+    return routes_inspector.RouteTable(routes).routes, docs
+
+
+def main1(router, service, version, output_dir,
+          title=None, format='swagger'):
+    log.info('Inspecting %s' % router)
+    routes, docs = load_routes(router, version)
+    swagger = routes_to_swagger(routes, service, version,
+                                title=title, docs=docs)
+    if format == 'rst':
+        from fairy_slipper.cmd import swagger_to_rst
+
+        swagger_to_rst.write_all(swagger, output_dir)
+        return
+    pathname = path.join(output_dir, '%s-%s-swagger.json' % (service,
+                                                             version))
+    log.info("Writing %s", pathname)
+    with open(pathname, 'w') as out_file:
+        json.dump(swagger, out_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help="Increase verbosity (specify multiple times for more)")
+    parser.add_argument(
+        '-o', '--output-dir', action='store', default=os.curdir,
+        help="The directory to output the files too.")
+    parser.add_argument(
+        '-f', '--format', action='store', default='swagger',
+        choices=['swagger', 'rst'],
+        help="Write swagger JSON, or ReST for the doc server.")
+    parser.add_argument(
+        '-s', '--service', action='store', required=True,
+        help="The name of the service, e.g. compute.")
+    parser.add_argument(
+        '-t', '--title', action='store',
+        help="The title of the API, defaults to the service name.")
+    parser.add_argument(
+        'router',
+        help="Class path of the router, e.g. murano.api.v1.router:API")
+    parser.add_argument(
+        'version',
+        help="The API version the router serves, e.g. v1")
+
+    args = parser.parse_args()
+
+    log_level = logging.WARNING
+    if args.verbose == 1:
+        log_level = logging.INFO
+    elif args.verbose >= 2:
+        log_level = logging.DEBUG
+
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    main1(args.router, args.service, args.version,
+          output_dir=args.output_dir, title=args.title,
+          format=args.format)
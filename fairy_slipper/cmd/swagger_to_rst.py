@@ -25,12 +25,14 @@ import os
 from os import path
 import textwrap
 
-from jinja2 import Environment
+from fairy_slipper.cmd import example_store
+from fairy_slipper.cmd.manifest import hash_file
+from fairy_slipper.cmd.timings import timer
 
 log = logging.getLogger(__name__)
 
 TMPL_API = """
-{%- for path, requests in swagger['paths'].items() -%}
+{%- for path, requests in swagger['paths']|dictsort(true) -%}
 {%- for request in requests -%}
 
 .. http:{{request.method}}:: {{path}}
@@ -45,7 +47,7 @@ TMPL_API = """
 {% if request['examples']['text/plain'] %}
    :requestexample: {{version}}/examples/{{request['id']}}_req.txt
 {%- endif -%}
-{% for status_code, response in request.responses.items() -%}
+{% for status_code, response in request.responses|dictsort(true) -%}
 {%- if response['examples']['application/json'] %}
    :responseexample {{status_code}}: {{version}}/examples/{{request['id']}}_resp_{{status_code}}.json
 {%- endif -%}
@@ -65,7 +67,7 @@ TMPL_API = """
 {% for parameter in request.parameters -%}
 {% if parameter.in == 'body' -%}
 {% if parameter.schema %}
-   :requestschema: {{version}}/{{request['id']}}.json
+   :requestschema: {{version}}/{{parameter.schema['$ref'].rsplit('/', 1)[1]}}.json
 {%- endif -%}
 {% elif parameter.in == 'path' %}
 {{ parameter|format_param('parameter') }}
@@ -75,7 +77,7 @@ TMPL_API = """
 {{ parameter|format_param('reqheader') }}
 {%- endif %}
 {%- endfor -%}
-{% for status_code, response in request.responses.items() %}
+{% for status_code, response in request.responses|dictsort(true) %}
    :statuscode {{status_code}}: {{response.description}}
 {%- endfor %}
 
@@ -95,7 +97,7 @@ TMPL_TAG = """
 
 {% endfor %}
 """
-environment = Environment()
+environment = None
 
 
 def format_param(obj, type='query'):
@@ -106,16 +108,42 @@ def format_param(obj, type='query'):
     new_text = param_wrap.wrap(obj['description'])
     return '\n'.join(new_text)
 
-environment.filters['format_param'] = format_param
+
+def get_environment():
+    global environment
+    if environment is None:
+        from jinja2 import Environment
+
+        environment = Environment()
+        environment.filters['format_param'] = format_param
+    return environment
 
 
 def main1(filename, output_dir):
+    """Convert a swagger file, returning the files read and written."""
     log.info('Parsing %s' % filename)
-    swagger = json.load(open(filename))
-    write_rst(swagger, output_dir)
-    write_jsonschema(swagger, output_dir)
-    write_examples(swagger, output_dir)
-    write_index(swagger, output_dir)
+    with timer.phase('read'):
+        swagger = json.load(open(filename))
+    return [filename], write_all(swagger, output_dir,
+                                 swagger_dir=path.dirname(filename))
+
+
+def write_all(swagger, output_dir, swagger_dir=None):
+    """Write all the files for a swagger document, returning their paths.
+
+    ``swagger_dir`` is the directory the document was read from.
+    """
+    with timer.phase('render'):
+        written = write_rst(swagger, output_dir)
+    with timer.phase('write_schemas'):
+        written.extend(write_jsonschema(swagger, output_dir))
+    with timer.phase('write_examples'):
+        written.extend(write_examples(swagger, output_dir, swagger_dir))
+    with timer.phase('write_checksums'):
+        written.extend(write_checksums(swagger, output_dir, written))
+    with timer.phase('write_index'):
+        written.extend(write_index(swagger, output_dir))
+    return written
 
 
 def write_index(swagger, output_dir):
@@ -132,13 +160,14 @@ def write_index(swagger, output_dir):
     index['/'.join([service, version, ''])] = info
     with codecs.open(filepath,
                      'w', "utf-8") as out_file:
-        json.dump(index, out_file, indent=2)
+        json.dump(index, out_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    return [filepath]
 
 
 def write_rst(swagger, output_dir):
-    environment.extend(swagger_info=swagger['info'])
-    write_apis(swagger, output_dir)
-    write_tags(swagger, output_dir)
+    get_environment().extend(swagger_info=swagger['info'])
+    return write_apis(swagger, output_dir) + write_tags(swagger, output_dir)
 
 
 def write_apis(swagger, output_dir):
@@ -149,7 +178,7 @@ def write_apis(swagger, output_dir):
     output_file = '%s.rst' % version
     if not path.exists(service_path):
         os.makedirs(service_path)
-    TMPL = environment.from_string(TMPL_API)
+    TMPL = get_environment().from_string(TMPL_API)
     result = TMPL.render(swagger=swagger,
                          version=swagger['info']['version'])
     filepath = path.join(service_path, output_file)
@@ -157,6 +186,7 @@ def write_apis(swagger, output_dir):
     with codecs.open(filepath,
                      'w', "utf-8") as out_file:
         out_file.write(result)
+    return [filepath]
 
 
 def write_tags(swagger, output_dir):
@@ -167,7 +197,7 @@ def write_tags(swagger, output_dir):
     if not path.exists(service_path):
         os.makedirs(service_path)
     output_file = '%s-tags.rst' % version
-    TMPL = environment.from_string(TMPL_TAG)
+    TMPL = get_environment().from_string(TMPL_TAG)
     result = TMPL.render(swagger=swagger,
                          version=swagger['info']['version'])
     filepath = path.join(service_path, output_file)
@@ -175,6 +205,7 @@ def write_tags(swagger, output_dir):
     with codecs.open(filepath,
                      'w', "utf-8") as out_file:
         out_file.write(result)
+    return [filepath]
 
 
 def write_jsonschema(swagger, output_dir):
@@ -188,15 +219,28 @@ def write_jsonschema(swagger, output_dir):
     if not path.exists(full_path):
         os.makedirs(full_path)
 
+    written = []
     for schema_name, schema in swagger['definitions'].items():
         filename = '%s.json' % schema_name
         filepath = path.join(full_path, filename)
         log.info("Writing %s", filepath)
-        file = open(filepath, 'w')
-        json.dump(schema, file, indent=2)
-
-
-def write_examples(swagger, output_dir):
+        if list(schema) == ['$ref']:
+            # A merged schema, refer to the file of the one it was
+            # merged into.
+            schema = {'$ref': '%s.json' % schema['$ref'].rsplit('/', 1)[1]}
+        with open(filepath, 'w') as file:
+            json.dump(schema, file, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+        written.append(filepath)
+    return written
+
+
+def write_examples(swagger, output_dir, swagger_dir=None):
+    """Write the examples of each operation.
+
+    Stored examples are linked from their :class:`ExampleStore`, which
+    the document refers to relative to ``swagger_dir``.
+    """
     info = swagger['info']
     version = info['version']
     service = info['service']
@@ -210,40 +254,63 @@ def write_examples(swagger, output_dir):
     if not path.exists(full_path):
         os.makedirs(full_path)
 
+    store = swagger.get(example_store.STORE_KEY)
+    if store:
+        store = path.join(swagger_dir or os.curdir, store)
+    written = []
     for operations in swagger['paths'].values():
         for operation in operations:
-            if 'examples' in operation:
-                for mime, example in operation['examples'].items():
-                    filename = '%s' % '_'.join([operation['id'], 'req'])
-                    if mime == 'application/json':
-                        filepath = path.join(full_path, filename + '.json')
-                        log.info("Writing %s", filepath)
-                        file = open(filepath, 'w')
-                        json.dump(example, file, indent=2)
-                    if mime == 'text/plain':
-                        filepath = path.join(full_path, filename + '.txt')
-                        log.info("Writing %s", filepath)
-                        example = example.strip()
-                        example = example + '\n'
-                        file = open(filepath, 'w')
-                        file.write(example)
+            examples = [('_'.join([operation['id'], 'req']), mime, example)
+                        for mime, example
+                        in operation.get('examples', {}).items()]
             for status_code, response in operation['responses'].items():
-                for mime, example in response['examples'].items():
-                    filename = '%s' % '_'.join([operation['id'],
-                                                'resp',
-                                                status_code])
-                    if mime == 'application/json':
-                        filepath = path.join(full_path, filename + '.json')
-                        log.info("Writing %s", filepath)
-                        file = open(filepath, 'w')
-                        json.dump(example, file, indent=2)
-                    if mime == 'text/plain':
-                        filepath = path.join(full_path, filename + '.txt')
-                        log.info("Writing %s", filepath)
-                        example = example.strip()
-                        example = example + '\n'
-                        file = open(filepath, 'w')
-                        file.write(example)
+                examples.extend(('_'.join([operation['id'], 'resp',
+                                           status_code]), mime, example)
+                                for mime, example
+                                in response['examples'].items())
+            for filename, mime, example in examples:
+                if mime not in example_store.EXTENSIONS:
+                    continue
+                filepath = path.join(full_path, '%s.%s' % (
+                    filename, example_store.EXTENSIONS[mime]))
+                log.info("Writing %s", filepath)
+                if example_store.is_stored(example):
+                    example_store.link_or_copy(
+                        path.join(store, example[example_store.STORE_KEY]),
+                        filepath)
+                else:
+                    if path.lexists(filepath):
+                        # It might be a link to a stored example.
+                        os.unlink(filepath)
+                    with open(filepath, 'w') as file:
+                        file.write(example_store.render_example(mime,
+                                                                example))
+                written.append(filepath)
+    return written
+
+
+def write_checksums(swagger, output_dir, filepaths):
+    """Write the sha256 of the files written for a swagger document.
+
+    The ``<version>.sha256`` file is in the format of ``sha256sum``,
+    with the paths relative to the service directory, so it can be
+    checked with ``sha256sum -c`` there.  Files outside of it, like
+    the shared index.json, aren't included.
+    """
+    info = swagger['info']
+    service_path = path.join(output_dir, info['service'])
+    filepath = path.join(service_path, '%s.sha256' % info['version'])
+    lines = []
+    for pathname in filepaths:
+        relpath = path.relpath(pathname, service_path)
+        if relpath.startswith(os.pardir):
+            continue
+        lines.append('%s  %s\n' % (hash_file(pathname),
+                                   relpath.replace(os.sep, '/')))
+    log.info("Writing %s", filepath)
+    with codecs.open(filepath, 'w', 'utf-8') as out_file:
+        out_file.writelines(sorted(lines))
+    return [filepath]
 
 
 def main():
@@ -257,6 +324,17 @@ def main():
     parser.add_argument(
         '-o', '--output-dir', action='store',
         help="The directory to output the JSON files too.")
+    parser.add_argument(
+        '--manifest', action='store',
+        help="Record the files each conversion used in this file, and "
+        "skip the conversion if none of them have changed.")
+    parser.add_argument(
+        '--timings', action='store',
+        help="Write the wall time, CPU time and peak memory of each "
+        "phase of the conversion to this JSON file.")
+    parser.add_argument(
+        '--profile', action='store',
+        help="Write a cProfile dump of the conversion to this file.")
     parser.add_argument(
         'filename',
         help="File to convert")
@@ -275,4 +353,10 @@ def main():
 
     filename = path.abspath(args.filename)
 
-    main1(filename, output_dir=args.output_dir)
+    from fairy_slipper.cmd import manifest
+    from fairy_slipper.cmd import timings
+
+    with timings.collect(args.timings, args.profile), \
+            timings.timer.file(filename):
+        manifest.convert('swagger_to_rst', main1, filename, args.output_dir,
+                         args.manifest)
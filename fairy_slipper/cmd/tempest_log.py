@@ -29,6 +29,8 @@ try:
 except ImportError:
     import urllib.parse as urlparse
 
+from fairy_slipper.cmd.timings import timer
+
 log = logging.getLogger(__name__)
 
 DEFAULT_PORTS = {
@@ -230,16 +232,22 @@ def parse_logfile(log_file):
 
 
 def main1(log_file, output_dir):
+    """Convert a log file, returning the files read and written."""
     log.info('Reading %s' % log_file)
-    calls = parse_logfile(open(log_file))
+    with timer.phase('parse'):
+        calls = parse_logfile(open(log_file))
     services = defaultdict(list)
     for req in calls.requests:
         call = (calls.requests[req], calls.responses[req])
         services[call[0]['service']].append(call)
+    written = []
     for service, calls in services.items():
         pathname = path.join(output_dir, '%s-examples.json' % (service))
-        with open(pathname, 'w') as out_file:
-            json.dump(calls, out_file, indent=2)
+        with timer.phase('write'), open(pathname, 'w') as out_file:
+            json.dump(calls, out_file, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+        written.append(pathname)
+    return [log_file], written
 
 
 def main():
@@ -253,6 +261,17 @@ def main():
     parser.add_argument(
         '-o', '--output-dir', action='store',
         help="The directory to output the JSON files too.")
+    parser.add_argument(
+        '--manifest', action='store',
+        help="Record the files each conversion used in this file, and "
+        "skip the conversion if none of them have changed.")
+    parser.add_argument(
+        '--timings', action='store',
+        help="Write the wall time, CPU time and peak memory of each "
+        "phase of the conversion to this JSON file.")
+    parser.add_argument(
+        '--profile', action='store',
+        help="Write a cProfile dump of the conversion to this file.")
     parser.add_argument(
         'filename',
         help="File to convert")
@@ -271,4 +290,10 @@ def main():
 
     filename = path.abspath(args.filename)
 
-    main1(filename, output_dir=args.output_dir)
+    from fairy_slipper.cmd import manifest
+    from fairy_slipper.cmd import timings
+
+    with timings.collect(args.timings, args.profile), \
+            timings.timer.file(filename):
+        manifest.convert('tempest_log', main1, filename, args.output_dir,
+                         args.manifest)
@@ -0,0 +1,160 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+log = logging.getLogger(__name__)
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in KiB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # macOS reports bytes, everything else KiB.
+        rss //= 1024
+    return rss
+
+
+def cpu_time():
+    """Return the user and system time used by this process."""
+    if hasattr(time, 'process_time'):
+        return time.process_time()
+    times = os.times()
+    return times[0] + times[1]
+
+
+def new_record(**fields):
+    fields.update({'wall': 0.0, 'cpu': 0.0, 'peak_rss_kb': None})
+    return fields
+
+
+def add_usage(record, wall_start, cpu_start):
+    record['wall'] += time.time() - wall_start
+    record['cpu'] += cpu_time() - cpu_start
+    record['peak_rss_kb'] = peak_rss()
+
+
+class Timer(object):
+    """Time the phases of a conversion, per input file.
+
+    Phases can be nested, a nested phase is reported by the names of
+    the phases it ran in joined by ``/``, and its time is also
+    included in theirs.  The peak RSS is that of the process when the
+    phase last ended.  Nothing is recorded unless the timer is
+    enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.run = new_record(phases={})
+        self.files = []
+        self.record = self.run
+        self.phases = []
+
+    @contextmanager
+    def file(self, filename):
+        """Record the phases run while converting filename."""
+        if not self.enabled:
+            yield None
+            return
+        record = new_record(filename=filename, phases={})
+        previous, self.record = self.record, record
+        wall_start, cpu_start = time.time(), cpu_time()
+        try:
+            yield record
+        finally:
+            add_usage(record, wall_start, cpu_start)
+            self.record = previous
+            self.files.append(record)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        self.phases.append(name)
+        key = '/'.join(self.phases)
+        phases = self.record['phases']
+        if key not in phases:
+            phases[key] = new_record(calls=0)
+        wall_start, cpu_start = time.time(), cpu_time()
+        try:
+            yield
+        finally:
+            self.phases.pop()
+            phases[key]['calls'] += 1
+            add_usage(phases[key], wall_start, cpu_start)
+
+    def report(self):
+        return dict(self.run, files=self.files)
+
+
+# The timer of this process.
+timer = Timer()
+
+
+@contextmanager
+def collect(timings_file=None, profile_file=None):
+    """Time everything run in the block if either file is given.
+
+    The timings are written to ``timings_file`` as JSON, and a cProfile
+    dump of the block to ``profile_file``.
+    """
+    if not timings_file and not profile_file:
+        yield
+        return
+    profiler = None
+    if profile_file:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    timer.reset()
+    timer.enabled = bool(timings_file)
+    wall_start, cpu_start = time.time(), cpu_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            log.info('Wrote profile to %s', profile_file)
+        if timings_file:
+            add_usage(timer.run, wall_start, cpu_start)
+            with open(timings_file, 'w') as out_file:
+                json.dump(timer.report(), out_file, indent=2,
+                          sort_keys=True)
+            log.info('Wrote timings to %s', timings_file)
+        timer.enabled = False
@@ -20,16 +20,25 @@ from __future__ import unicode_literals
 
 from collections import defaultdict
 from copy import copy
+from copy import deepcopy
+import hashlib
+from io import BytesIO
 import json
 import logging
 import os
 from os import path
 import re
+import tempfile
 import textwrap
+import time
 import xml.sax
+import xml.sax.xmlreader
 
-from jinja2 import Environment
-import prettytable
+import six
+
+from fairy_slipper.cmd.example_store import ExampleStore
+from fairy_slipper.cmd.timings import timer
+from fairy_slipper.cmd import xmlparse
 
 log = logging.getLogger(__name__)
 
@@ -109,22 +118,32 @@ WHITESPACE_RE = re.compile('[\s]+', re.MULTILINE)
 URL_TEMPLATE_RE = re.compile('{[^{}]+}')
 CAPTION_RE = re.compile('[*`]*')
 
+# Bump when the parsed WADL representation changes.
+CACHE_FORMAT = '2'
 
-environment = Environment()
 HTTP_REQUEST = """{{ method }} {{ url }} HTTP/1.1
-{% for key, value in headers.items() -%}
+{% for key, value in headers|dictsort(true) -%}
 {{ key }}: {{ value }}
 {% endfor %}
 """
-HTTP_REQUEST_TMPL = environment.from_string(HTTP_REQUEST)
 
 HTTP_RESPONSE = """HTTP/1.1 {{ status_code }}
-{% for key, value in headers.items() -%}
+{% for key, value in headers|dictsort(true) -%}
 {{ key }}: {{ value }}
 {% endfor %}
 {{ body }}
 """
-HTTP_RESPONSE_TMPL = environment.from_string(HTTP_RESPONSE)
+
+templates = {}
+
+
+def render_template(source, **kwargs):
+    """Render one of the templates above, compiling it on first use."""
+    if source not in templates:
+        from jinja2 import Environment
+
+        templates[source] = Environment().from_string(source)
+    return templates[source].render(**kwargs)
 
 
 def create_parameter(name, _in, description='',
@@ -144,39 +163,29 @@ def join_url(parts):
     return '/'.join(parts).replace('//', '/')
 
 
-class SubParser(xml.sax.ContentHandler):
+class SubParser(xml.sax.ContentHandler, xmlparse.ElementStack):
     def __init__(self, parent):
         # general state
-        self.tag_stack = []
-        self.attr_stack = []
+        self.reset_stack()
         self.parent = parent
         self.result = None
         self.kwargs = {}
 
     def startElement(self, name, _attrs):
         attrs = dict(_attrs)
-        self.tag_stack.append(name)
-        self.attr_stack.append(attrs)
+        self.push_element(name, attrs)
         return attrs
 
     def endElement(self, name):
-        self.tag_stack.pop()
-        self.attr_stack.pop()
+        self.pop_element()
         if not self.tag_stack:
             self.parent.detach_subparser(self.result, **self.kwargs)
 
-    def search_stack_for(self, tag_name):
-        for tag, attrs in zip(reversed(self.tag_stack),
-                              reversed(self.attr_stack)):
-            if tag == tag_name:
-                return attrs
-
-    def on_top_tag_stack(self, *args):
-        return self.tag_stack[-len(args):] == list(args)
-
 
 class TableMixin(object):
     def visit_table(self, attrs):
+        import prettytable
+
         self.__table = prettytable.PrettyTable(hrules=prettytable.ALL)
         self.__table.header = False
 
@@ -230,6 +239,8 @@ class ParaParser(SubParser, TableMixin):
 
     def __init__(self, parent):
         super(ParaParser, self).__init__(parent)
+        self.visitors = xmlparse.dispatch_table(type(self), 'visit_')
+        self.departures = xmlparse.dispatch_table(type(self), 'depart_')
         self.content_stack = [[]]
         self.current_emphasis = None
         self.nesting = 0
@@ -248,23 +259,24 @@ class ParaParser(SubParser, TableMixin):
 
     def startElement(self, name, _attrs):
         super(ParaParser, self).startElement(name, _attrs)
-        fn = getattr(self, 'visit_%s' % name, None)
+        fn = self.visitors.get(name)
         if fn:
-            fn(dict(_attrs))
+            fn(self, dict(_attrs))
 
     def endElement(self, name):
         content = ''.join(self.content)
         self.result = content
         super(ParaParser, self).endElement(name)
-        fn = getattr(self, 'depart_%s' % name, None)
+        fn = self.departures.get(name)
         if fn:
-            fn()
+            fn(self)
 
     def characters(self, content):
         if not content:
             return
+        listing = self.on_top_tag_stack('programlisting')
         # Fold up any white space into a single char
-        if not self.on_top_tag_stack('programlisting'):
+        if not listing:
             content = WHITESPACE_RE.sub(' ', content)
 
         if content == ' ':
@@ -276,7 +288,7 @@ class ParaParser(SubParser, TableMixin):
                 content = ' ' * self.nesting + content.strip()
             elif self.content[-1].endswith(' '):
                 content = content.strip()
-            elif (self.on_top_tag_stack('programlisting')):
+            elif listing:
                 if self.content[-1].endswith('<'):
                     pass
                 else:
@@ -297,8 +309,7 @@ class ParaParser(SubParser, TableMixin):
             self.content.append(content)
 
     def visit_listitem(self, attrs):
-        self.nesting = len([tag for tag in self.tag_stack
-                            if tag == 'listitem']) - 1
+        self.nesting = self.count_open('listitem') - 1
         if self.nesting > 0:
             prev_nesting = self.nesting - 1
             self.base_indent = ' ' * prev_nesting + '  '
@@ -319,8 +330,7 @@ class ParaParser(SubParser, TableMixin):
         else:
             self.content.append('\n')
 
-        self.nesting = len([tag for tag in self.tag_stack
-                            if tag == 'listitem']) - 1
+        self.nesting = self.count_open('listitem') - 1
         if self.nesting > 0:
             prev_nesting = self.nesting - 1
             self.base_indent = ' ' * prev_nesting + '  '
@@ -473,25 +483,382 @@ class ParaParser(SubParser, TableMixin):
         self.hyperlink_end = True
 
 
-class WADLHandler(xml.sax.ContentHandler):
+def content_hash(content):
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def copy_operation(operation, tags):
+    """Copy an operation for a book, sharing its example payloads."""
+    operation = copy(operation)
+    operation['tags'] = tags
+    operation['examples'] = copy(operation['examples'])
+    operation['parameters'] = deepcopy(operation['parameters'])
+    operation['responses'] = {status_code: copy(response)
+                              for status_code, response
+                              in operation['responses'].items()}
+    return operation
+
+
+class WADL(object):
+    """The parts of a WADL file that don't depend on the api-ref book.
+
+    ``methods`` holds a ``(url, operation, resource_ids)`` entry for
+    each method in document order, the operations are tagged for a
+    particular book by :meth:`operations`.  ``samples`` maps the
+    sample files that were read to a hash of their content.
+    """
+
+    def __init__(self, filename, urls, methods, schemas, samples):
+        self.filename = filename
+        self.urls = urls
+        self.methods = methods
+        self.schemas = schemas
+        self.samples = samples
+
+    def operations(self, api_ref):
+        """Return the paths and schemas of the file for an api-ref book."""
+        filename = self.filename
+        method_tag_map = {method.split('#', 1)[1]: tag
+                          for method, tag
+                          in api_ref['method_tags'].items()
+                          if method.split('#', 1)[0] == filename}
+        resource_tag_map = {resource.split('#', 1)[1]: tag
+                            for resource, tag
+                            in api_ref['resource_tags'].items()
+                            if resource.split('#', 1)[0] == filename}
+        file_tag = api_ref['file_tags'].get(filename, None)
+        actual_tags = set(tag['name'] for tag in api_ref['tags'])
+
+        apis = {url: [] for url in self.urls}
+        for url, operation, resource_ids in self.methods:
+            id = operation['id']
+            tags = set()
+            tag = method_tag_map.get(id, '')
+            if tag:
+                tags.add(tag)
+            elif resource_ids is not None:
+                for tag_id in reversed(resource_ids):
+                    r_tag_id = resource_tag_map.get(tag_id)
+                    if r_tag_id not in actual_tags:
+                        continue
+                    tags.add(r_tag_id)
+                    break
+            if not tags:
+                if file_tag:
+                    tags.add(file_tag)
+            # If there are no tags then we couldn't find the method in
+            # the chapters.
+            if tags:
+                apis[url].append(copy_operation(operation, sorted(tags)))
+            else:
+                log.warning("No tags for method %s" % id)
+        return apis, deepcopy(self.schemas)
+
+    def to_json(self):
+        return {'filename': self.filename,
+                'urls': self.urls,
+                'methods': self.methods,
+                'schemas': self.schemas,
+                'samples': self.samples}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['filename'], data['urls'],
+                   [tuple(method) for method in data['methods']],
+                   data['schemas'], data['samples'])
+
+
+class WADLCache(object):
+    """Parsed WADL files, keyed by their path and content.
+
+    If ``directory`` is set the parsed files are also stored there and
+    reused by later runs, as long as neither the WADL file nor any of
+    the samples it includes have changed.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.wadls = {}
+
+    def key(self, filename, content):
+        digest = hashlib.sha256(CACHE_FORMAT.encode('ascii'))
+        digest.update(filename.encode('utf-8') + b'\0')
+        digest.update(content)
+        return digest.hexdigest()
+
+    def parse(self, filename):
+        return self.parse_all([filename])[0]
+
+    def parse_all(self, filenames, jobs=1):
+        """Return the parsed WADL of each file.
+
+        Files that aren't cached are parsed on a pool of ``jobs``
+        processes, the results are in the same order as filenames.
+        """
+        wadls = [None] * len(filenames)
+        pending = []
+        for index, filename in enumerate(filenames):
+            with open(filename, 'rb') as wadl_file:
+                content = wadl_file.read()
+            key = self.key(filename, content)
+            if key in self.wadls:
+                log.debug('Reusing parsed %s', filename)
+            else:
+                wadl = self.load(key)
+                if wadl is None:
+                    pending.append((index, key, filename, content))
+                    continue
+                self.wadls[key] = wadl
+            wadls[index] = self.wadls[key]
+
+        tasks = [(filename, content)
+                 for index, key, filename, content in pending]
+        if jobs and jobs > 1 and len(tasks) > 1:
+            import multiprocessing
+
+            pool = multiprocessing.Pool(min(jobs, len(tasks)))
+            try:
+                parsed = pool.map(parse_wadl, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            for wadl, reads, hits in parsed:
+                loaded_samples.reads += reads
+                loaded_samples.hits += hits
+        else:
+            parsed = [parse_wadl(task) for task in tasks]
+        parsed = [wadl for wadl, reads, hits in parsed]
+
+        for (index, key, filename, content), wadl in zip(pending, parsed):
+            self.store(key, wadl)
+            self.wadls[key] = wadls[index] = wadl
+        return wadls
+
+    def forget(self, pathnames):
+        """Drop the parsed files that are, or include, any of pathnames."""
+        pathnames = set(pathnames)
+        for key, wadl in list(self.wadls.items()):
+            if wadl.filename in pathnames or pathnames.intersection(
+                    wadl.samples):
+                del self.wadls[key]
+
+    def filepath(self, key):
+        return path.join(self.directory, key + '.json')
+
+    def load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self.filepath(key)) as cache_file:
+                wadl = WADL.from_json(json.load(cache_file))
+        except (IOError, OSError, ValueError):
+            return None
+        for pathname, sample_hash in wadl.samples.items():
+            try:
+                with open(pathname, 'rb') as sample_file:
+                    current_hash = content_hash(sample_file.read())
+            except IOError:
+                current_hash = None
+            if current_hash != sample_hash:
+                log.info('Sample %s has changed', pathname)
+                return None
+        log.debug('Loaded parsed %s from cache', wadl.filename)
+        return wadl
+
+    def store(self, key, wadl):
+        if not self.directory:
+            return
+        if not path.isdir(self.directory):
+            os.makedirs(self.directory)
+        fd, tmp_filepath = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(wadl.to_json(), tmp_file)
+            os.rename(tmp_filepath, self.filepath(key))
+        except (IOError, OSError):
+            log.warning("Failed to write cache entry for %s", wadl.filename)
+            if path.exists(tmp_filepath):
+                os.unlink(tmp_filepath)
+
+
+class SampleCache(object):
+    """The sample files included by WADL files, keyed by path.
+
+    JSON samples are only parsed once and the same object is shared by
+    every operation, and every later conversion, that includes the
+    file.  Callers must not modify them, copy a sample before changing
+    it.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.reads = 0
+        self.hits = 0
+
+    def counts(self):
+        """Return how many samples were read and reused so far."""
+        return self.reads, self.hits
+
+    def load(self, pathname, media_type):
+        """Return the hash of a sample file and its content.
+
+        Both are None if the file can't be read.  The content is
+        shared, and must not be modified.
+        """
+        key = (pathname, media_type)
+        if key in self.samples:
+            self.hits += 1
+            return self.samples[key]
+        self.reads += 1
+        with timer.phase('load_sample'):
+            try:
+                with open(pathname) as sample_file:
+                    content = sample_file.read()
+            except IOError:
+                log.warning("Can't find file %s" % pathname)
+                sample = (None, None)
+            else:
+                if media_type == 'application/json':
+                    sample = (content_hash(content), json.loads(content))
+                else:
+                    sample = (content_hash(content), content)
+        self.samples[key] = sample
+        return sample
+
+    def forget(self, pathnames):
+        """Drop any of pathnames, so they are read again."""
+        pathnames = set(pathnames)
+        for key in list(self.samples):
+            if key[0] in pathnames:
+                del self.samples[key]
+
+
+# The samples read by this process.
+loaded_samples = SampleCache()
+
+
+def parse_wadl(task):
+    """Parse a WADL file.
+
+    Also returns how many samples were read and reused while parsing
+    it, those of a pool worker aren't counted in this process.
+    """
+    filename, content = task
+    log.info('Parsing %s' % filename)
+    reads, hits = loaded_samples.counts()
+    ch = WADLHandler(filename)
+    source = xml.sax.xmlreader.InputSource(filename)
+    source.setByteStream(BytesIO(content))
+    xmlparse.parse(source, ch)
+    return (ch.wadl, loaded_samples.reads - reads,
+            loaded_samples.hits - hits)
+
+
+# The parsed WADL caches of this process, keyed by cache directory.
+caches = {}
+
+
+def get_cache(directory=None):
+    if directory not in caches:
+        caches[directory] = WADLCache(directory)
+    return caches[directory]
+
+
+class PathNode(object):
+    __slots__ = ('literals', 'patterns', 'urlpaths')
+
+    def __init__(self):
+        self.literals = {}
+        # Segments with templates in them, keyed by regular expression.
+        self.patterns = {}
+        self.urlpaths = []
+
+
+class PathMatcher(object):
+    """Match URLs against swagger URL templates.
+
+    The templates are stored in a trie of their path segments, so
+    matching a URL walks its segments instead of trying the regular
+    expression of every template.
+    """
+
+    def __init__(self, urlpaths):
+        self.root = PathNode()
+        for index, urlpath in enumerate(urlpaths):
+            node = self.root
+            for segment in urlpath.split('/'):
+                if URL_TEMPLATE_RE.search(segment):
+                    pattern = URL_TEMPLATE_RE.sub('[^/]+', segment)
+                    if pattern not in node.patterns:
+                        node.patterns[pattern] = (
+                            re.compile('^' + pattern + '$'), PathNode())
+                    node = node.patterns[pattern][1]
+                else:
+                    node = node.literals.setdefault(segment, PathNode())
+            node.urlpaths.append((index, urlpath))
+
+    def match(self, url):
+        """Return the templates matching url in the order they were given."""
+        nodes = [self.root]
+        for segment in url.split('/'):
+            matched = []
+            for node in nodes:
+                if segment in node.literals:
+                    matched.append(node.literals[segment])
+                for regex, child in node.patterns.values():
+                    if regex.match(segment):
+                        matched.append(child)
+            if not matched:
+                return []
+            nodes = matched
+        return [urlpath for index, urlpath
+                in sorted(urlpath for node in nodes
+                          for urlpath in node.urlpaths)]
+
+
+class WADLHandler(xml.sax.ContentHandler, xmlparse.ElementStack):
+    """Parse a WADL file.
+
+    The result is in :attr:`wadl`, if ``api_ref`` is given the methods
+    are also tagged for that book in :attr:`apis` and :attr:`schemas`.
+    """
+
+    # The methods taking the content of a wadl:doc, keyed by the
+    # elements the wadl:doc is directly inside.
+    DOC_PARSERS = {
+        ('resource', 'param'): 'parameter_description',
+        ('method',): 'api_summary',
+        ('request', 'representation', 'param'):
+        'request_parameter_description',
+        ('response', 'representation', 'param'):
+        'response_schema_description',
+    }
+
+    # The methods handling each element, after it has been pushed on
+    # the stack.
+    ELEMENTS = {
+        'method': 'start_method',
+        'resource': 'start_resource',
+        'xsdxt:code': 'start_code',
+        'response': 'start_response',
+        'param': 'start_param',
+    }
 
-    def __init__(self, filename, api_ref):
+    def __init__(self, filename, api_ref=None, sample_cache=None):
         self.filename = filename
         self.api_ref = api_ref
-        self.method_tag_map = {method.split('#', 1)[1]: tag
-                               for method, tag
-                               in self.api_ref['method_tags'].items()
-                               if method.split('#', 1)[0] == filename}
-        self.resource_tag_map = {resource.split('#', 1)[1]: tag
-                                 for resource, tag
-                                 in self.api_ref['resource_tags'].items()
-                                 if resource.split('#', 1)[0] == filename}
-        self.file_tag = self.api_ref['file_tags'].get(filename, None)
-        self.actual_tags = set(tag['name'] for tag in self.api_ref['tags'])
+        self.sample_cache = sample_cache or loaded_samples
+        self.starts = dict((name, getattr(self, method))
+                           for name, method in self.ELEMENTS.items())
 
     def startDocument(self):
         # API state
-        self.apis = {}
+        self.urls = []
+        self.methods = []
+        self.samples = {}
         self.current_api = None
         self.schemas = {}
 
@@ -507,8 +874,7 @@ class WADLHandler(xml.sax.ContentHandler):
         self.url = []
 
         # general state
-        self.tag_stack = []
-        self.attr_stack = []
+        self.reset_stack()
         self.content = None
         self.parser = None
 
@@ -522,10 +888,13 @@ class WADLHandler(xml.sax.ContentHandler):
         self.result_fn = result_fn
 
     def endDocument(self):
-        for api in self.apis.values():
-            for method in api:
-                method['consumes'] = list(method['consumes'])
-                method['produces'] = list(method['produces'])
+        for url, method, resource_ids in self.methods:
+            method['consumes'] = sorted(method['consumes'])
+            method['produces'] = sorted(method['produces'])
+        self.wadl = WADL(self.filename, self.urls, self.methods,
+                         self.schemas, self.samples)
+        if self.api_ref is not None:
+            self.apis, self.schemas = self.wadl.operations(self.api_ref)
 
     def parameter_description(self, content, **kwargs):
         name = self.search_stack_for('param')['name']
@@ -569,185 +938,156 @@ class WADLHandler(xml.sax.ContentHandler):
             schema = self.schemas[schema_name]
             schema['properties'][name]['description'] = content.strip()
 
-    def search_stack_for(self, tag_name):
-        for tag, attrs in zip(reversed(self.tag_stack),
-                              reversed(self.attr_stack)):
-            if tag == tag_name:
-                return attrs
-
-    def on_top_tag_stack(self, *args):
-        return self.tag_stack[-len(args):] == list(args)
-
     def startElement(self, name, _attrs):
         attrs = dict(_attrs)
         if name == 'wadl:doc':
-            if self.on_top_tag_stack('resource', 'param'):
-                self.attach_subparser(ParaParser(self),
-                                      self.parameter_description)
-            if self.on_top_tag_stack('method'):
-                self.current_api['title'] = attrs.get('title')
-                self.attach_subparser(ParaParser(self), self.api_summary)
-
-            if self.on_top_tag_stack('request', 'representation',
-                                     'param'):
-                self.attach_subparser(ParaParser(self),
-                                      self.request_parameter_description)
-            if self.on_top_tag_stack('response', 'representation', 'param'):
-                self.attach_subparser(ParaParser(self),
-                                      self.response_schema_description)
+            self.start_doc(attrs)
 
         if self.parser:
             return self.parser.startElement(name, _attrs)
 
-        self.tag_stack.append(name)
-        self.attr_stack.append(attrs)
+        self.push_element(name, attrs)
         self.content = []
-        if name == 'method':
-            if 'id' in attrs and 'name' in attrs:
-                id = attrs['id']
-                if id in self.url_map:
-                    url = self.url_map[id]
-                elif id in self.resource_map:
-                    resource = self.resource_map[id]
-                    url = self.resource_types[resource]
-                else:
-                    log.warning("Can't find method %s", id)
-                    # Create the minimal object to prevent creating
-                    # exceptions for this case everywhere.
-                    self.current_api = {
-                        'produces': set(),
-                        'consumes': set(),
-                        'examples': {},
-                        'responses': {},
-                        'parameters': {},
-                    }
-                    return
-                tag = self.method_tag_map.get(id, '')
-                name = attrs['name'].lower()
-                if url in self.apis:
-                    root_api = self.apis[url]
-                else:
-                    self.apis[url] = root_api = []
+        start = self.starts.get(name)
+        if start:
+            start(attrs)
+
+    def start_doc(self, attrs):
+        for depth in (1, 2, 3):
+            result_fn = self.DOC_PARSERS.get(tuple(self.tag_stack[-depth:]))
+            if result_fn:
+                break
+        else:
+            return
+        if result_fn == 'api_summary':
+            self.current_api['title'] = attrs.get('title')
+        self.attach_subparser(ParaParser(self), getattr(self, result_fn))
+
+    def start_method(self, attrs):
+        if 'id' in attrs and 'name' in attrs:
+            id = attrs['id']
+            if id in self.url_map:
+                url = self.url_map[id]
+            elif id in self.resource_map:
+                resource = self.resource_map[id]
+                url = self.resource_types[resource]
+            else:
+                log.warning("Can't find method %s", id)
+                # Create the minimal object to prevent creating
+                # exceptions for this case everywhere.
                 self.current_api = {
-                    'id': id,
-                    'tags': set(),
-                    'method': name,
                     'produces': set(),
                     'consumes': set(),
                     'examples': {},
-                    'parameters': [{'in': "body",
-                                    'name': "body",
-                                    'description': "",
-                                    'required': False,
-                                    'schema': {
-                                        '$ref': "#/definitions/%s" % id
-                                    }}],
                     'responses': {},
+                    'parameters': {},
                 }
-                if tag:
-                    self.current_api['tags'].add(tag)
-                elif id in self.resource_ids:
-                    for tag_id in reversed(self.resource_ids[id]):
-                        r_tag_id = self.resource_tag_map.get(tag_id)
-                        if r_tag_id not in self.actual_tags:
-                            continue
-                        self.current_api['tags'].add(r_tag_id)
-                        break
-                if not self.current_api['tags']:
-                    if self.file_tag:
-                        self.current_api['tags'].add(self.file_tag)
-                self.current_api['tags'] = list(self.current_api['tags'])
-                # If there are no tags then we couldn't find the
-                # method in the chapters.
-                if self.current_api['tags']:
-                    root_api.append(self.current_api)
-                else:
-                    log.warning("No tags for method %s" % id)
+                return
+            name = attrs['name'].lower()
+            if url not in self.urls:
+                self.urls.append(url)
+            self.current_api = {
+                'id': id,
+                'tags': [],
+                'method': name,
+                'produces': set(),
+                'consumes': set(),
+                'examples': {},
+                'parameters': [{'in': "body",
+                                'name': "body",
+                                'description': "",
+                                'required': False,
+                                'schema': {
+                                    '$ref': "#/definitions/%s" % id
+                                }}],
+                'responses': {},
+            }
+            # The book's tags are resolved from the resources
+            # that reference the method so far.
+            self.methods.append((url, self.current_api,
+                                 self.resource_ids.get(id)))
 
-                for param, doc in self.url_params.items():
-                    if ('{%s}' % param) in url:
-                        self.current_api['parameters'].append(
-                            create_parameter(param, 'template', doc))
+            for param, doc in self.url_params.items():
+                if ('{%s}' % param) in url:
+                    self.current_api['parameters'].append(
+                        create_parameter(param, 'template', doc))
 
-        # URL paths
-        if name == 'resource':
-            self.url.append(attrs.get('path', '').replace('//', '/'))
-            self.resource_id_stack.append(attrs.get('id', None))
+        # Methods and Resource Types
         if self.on_top_tag_stack('resource_type', 'method'):
             self.resource_map[attrs.get('href').strip('#')] \
                 = self.attr_stack[-2]['id']
-
-        # Methods and Resource Types
-        if name == 'resource' and attrs.get('type'):
-            self.resource_types[attrs.get('type').strip('#')] \
-                = join_url(self.url)
         if self.on_top_tag_stack('resource', 'method'):
             href = attrs.get('href').strip('#')
             self.url_map[href] = join_url(self.url)
             self.resource_ids[href] = [r_id for r_id in self.resource_id_stack
                                        if r_id]
 
-        if name == 'xsdxt:code':
-            if not attrs.get('href'):
-                return
-            if self.search_stack_for('response') is not None:
-                type = 'response'
-                status_code = self.search_stack_for('response')['status']
-                if ' ' in status_code:
-                    status_codes = status_code.split(' ')
-                    if '200' in status_codes:
-                        status_code = '200'
-                    # TODO(arrsim) need to do something with the other
-                    # status codes
-            elif self.search_stack_for('request') is not None:
-                type = 'request'
-            else:
-                log.error("Can't find request or response tag. %s",
-                          self.tag_stack)
-                raise Exception("Can't find request or response tag.")
-            media_type = MIME_MAP[attrs['href'].rsplit('.', 1)[-1]]
-
-            # XML is removed, skip all these
-            if media_type == 'application/xml':
-                return
+    def start_resource(self, attrs):
+        # URL paths
+        self.url.append(attrs.get('path', '').replace('//', '/'))
+        self.resource_id_stack.append(attrs.get('id', None))
+        if attrs.get('type'):
+            self.resource_types[attrs.get('type').strip('#')] \
+                = join_url(self.url)
 
-            pathname = path.join(path.dirname(self.filename), attrs['href'])
-            try:
-                sample = open(pathname).read()
-                if media_type == 'application/json':
-                    sample = json.loads(sample)
-            except IOError:
-                log.warning("Can't find file %s" % pathname)
-                sample = None
-
-            if media_type != 'text/plain':
-                self.current_api['produces'].add(media_type)
-                self.current_api['consumes'].add(media_type)
-            if sample and type == 'response':
-                response = self.current_api['responses'][status_code]
-                response['examples'][media_type] = sample
-            elif sample and type == 'request':
-                # Add request examples (Not swagger supported)
-                self.current_api['examples'][media_type] = sample
-
-        if name == 'response':
-            if 'status' not in attrs:
-                return
-            status_code = attrs['status']
-            response = {
-                'headers': {},
-                'examples': {},
-            }
+    def start_code(self, attrs):
+        if not attrs.get('href'):
+            return
+        if self.search_stack_for('response') is not None:
+            type = 'response'
+            status_code = self.search_stack_for('response')['status']
             if ' ' in status_code:
                 status_codes = status_code.split(' ')
-                for status_code in status_codes:
-                    # For each of the multiple status make copies of
-                    # blank responses?  The duplicates will be ignored
-                    # by subsequent calls that update the response object.
-                    self.current_api['responses'][status_code] = copy(response)
-            else:
-                self.current_api['responses'][status_code] = response
+                if '200' in status_codes:
+                    status_code = '200'
+                # TODO(arrsim) need to do something with the other
+                # status codes
+        elif self.search_stack_for('request') is not None:
+            type = 'request'
+        else:
+            log.error("Can't find request or response tag. %s",
+                      self.tag_stack)
+            raise Exception("Can't find request or response tag.")
+        media_type = MIME_MAP[attrs['href'].rsplit('.', 1)[-1]]
+
+        # XML is removed, skip all these
+        if media_type == 'application/xml':
+            return
+
+        pathname = path.abspath(path.join(path.dirname(self.filename),
+                                          attrs['href']))
+        self.samples[pathname], sample = self.sample_cache.load(
+            pathname, media_type)
+
+        if media_type != 'text/plain':
+            self.current_api['produces'].add(media_type)
+            self.current_api['consumes'].add(media_type)
+        if sample and type == 'response':
+            response = self.current_api['responses'][status_code]
+            response['examples'][media_type] = sample
+        elif sample and type == 'request':
+            # Add request examples (Not swagger supported)
+            self.current_api['examples'][media_type] = sample
 
+    def start_response(self, attrs):
+        if 'status' not in attrs:
+            return
+        status_code = attrs['status']
+        response = {
+            'headers': {},
+            'examples': {},
+        }
+        if ' ' in status_code:
+            status_codes = status_code.split(' ')
+            for status_code in status_codes:
+                # For each of the multiple status make copies of
+                # blank responses?  The duplicates will be ignored
+                # by subsequent calls that update the response object.
+                self.current_api['responses'][status_code] = copy(response)
+        else:
+            self.current_api['responses'][status_code] = response
+
+    def start_param(self, attrs):
         if self.on_top_tag_stack('request', 'representation', 'param'):
             parameters = self.current_api['parameters']
             name = attrs['name']
@@ -817,8 +1157,7 @@ class WADLHandler(xml.sax.ContentHandler):
             self.url.pop()
             self.resource_id_stack.pop()
 
-        self.tag_stack.pop()
-        self.attr_stack.pop()
+        self.pop_element()
 
     def characters(self, content):
         if self.parser:
@@ -829,9 +1168,129 @@ class WADLHandler(xml.sax.ContentHandler):
             self.content.append(content)
 
 
-def main1(source_file, output_dir):
-    log.info('Reading API description from %s' % source_file)
-    api_ref = json.load(open(source_file))
+def examples_filename(api_ref, directory):
+    """Return the path of the tempest examples for an api-ref book."""
+    example_name = (api_ref['service']
+                    .replace('-admin', '')
+                    .replace('-extensions', ''))
+    return path.join(directory, example_name + '-examples.json')
+
+
+def operation_schemas(swagger):
+    """Yield the schemas of the parameters and responses of swagger."""
+    for operations in swagger['paths'].values():
+        for operation in operations:
+            for parameter in operation['parameters']:
+                if parameter.get('schema'):
+                    yield parameter['schema']
+            for response in operation['responses'].values():
+                if response.get('schema'):
+                    yield response['schema']
+
+
+def dedupe_schemas(swagger, aliases=False):
+    """Merge the identical schemas in the definitions of a swagger document.
+
+    Each set of identical schemas is kept under the first of their
+    names in sorted order, and the ``$ref`` of every operation using
+    one of the other names is changed to it.  If ``aliases`` is set
+    the other names are kept as a ``$ref`` to it.  Names no operation
+    refers to, like the ``<id>_<status>`` response schemas, are only
+    found by their name, so they are always kept as a ``$ref``.
+    Returns a map of the merged names to the names they were merged
+    into.
+    """
+    definitions = swagger['definitions']
+    referenced = set(schema['$ref'].rsplit('/', 1)[1]
+                     for schema in operation_schemas(swagger)
+                     if '$ref' in schema)
+    canonical_names = {}
+    renamed = {}
+    for name in sorted(definitions):
+        key = content_hash(json.dumps(definitions[name], sort_keys=True))
+        canonical = canonical_names.setdefault(key, name)
+        if canonical != name:
+            renamed[name] = canonical
+    if not renamed:
+        return renamed
+
+    for name, canonical in renamed.items():
+        if aliases or name not in referenced:
+            definitions[name] = {'$ref': '#/definitions/%s' % canonical}
+        else:
+            del definitions[name]
+    for schema in operation_schemas(swagger):
+        if '$ref' not in schema:
+            continue
+        name = schema['$ref'].rsplit('/', 1)[1]
+        if name in renamed:
+            schema['$ref'] = '#/definitions/%s' % renamed[name]
+    return renamed
+
+
+def add_examples(output, examples):
+    """Add the tempest examples to the operations they match."""
+    matcher = PathMatcher(output['paths'])
+    for ex_request, ex_response in examples:
+        method = ex_request['method'].lower()
+        urlpaths = matcher.match(ex_request['url'])
+        if not urlpaths:
+            log.warning("Service %s %s doesn't have matching "
+                        "URL for example %s %s",
+                        output['info']['service'], output['info']['version'],
+                        method, ex_request['url'])
+        for urlpath in urlpaths:
+            method_count = defaultdict(int)
+            for operation in output['paths'][urlpath]:
+                method_count[operation['method'].lower()] += 1
+
+            if any(i > 1 for i in method_count.values()):
+                # Skip any of the multi-payload endpoints.  They
+                # are madness.
+                break
+
+            for operation in output['paths'][urlpath]:
+                if operation['method'].lower() == method:
+                    break
+            else:
+                log.warning("Couldn't find any operations %s for %s",
+                            method, urlpath)
+                break
+
+            request = render_template(
+                HTTP_REQUEST,
+                headers=ex_request['headers'],
+                method=ex_request['method'],
+                url=ex_request['url'])
+            operation['examples'] = {'text/plain': request}
+
+            # Override any responses
+            status_code = ex_response['status_code']
+            response = render_template(
+                HTTP_RESPONSE,
+                status_code=status_code,
+                headers=ex_response['headers'],
+                body=ex_response['body'] or '')
+            if status_code in operation['responses']:
+                operation['responses'][status_code]['examples'] = \
+                    {'text/plain': response}
+            else:
+                operation['responses'][status_code] = \
+                    {'examples': {'text/plain': response}}
+
+
+def api_ref_to_swagger(api_ref, examples_file=None, cache_dir=None,
+                       parse_jobs=1, schema_aliases=False, store_dir=None,
+                       output_dir=None):
+    """Return the swagger document for an api-ref book.
+
+    Also returns the files that were read, which includes the
+    examples file even if it doesn't exist.  Identical schemas are
+    merged by :func:`dedupe_schemas`.  If there is a ``store_dir``
+    the example payloads are moved to an :class:`ExampleStore` there,
+    which is referred to relative to ``output_dir``, where the
+    document is written.
+    """
     files = set()
     for filepath in api_ref['method_tags'].keys():
         files.add(filepath.split('#', 1)[0])
@@ -841,14 +1300,10 @@ def main1(source_file, output_dir):
         files.add(filepath.split('#', 1)[0])
 
     # Load supplementary examples file
-    example_name = (api_ref['service']
-                    .replace('-admin', '')
-                    .replace('-extensions', ''))
-    examples_file = path.join(path.dirname(source_file),
-                              example_name + '-examples.json')
-    if path.exists(examples_file):
+    if examples_file and path.exists(examples_file):
         log.info('Reading examples from %s' % examples_file)
-        examples = json.load(open(examples_file))
+        with timer.phase('read_examples'):
+            examples = json.load(open(examples_file))
     else:
         examples = []
 
@@ -872,70 +1327,62 @@ def main1(source_file, output_dir):
         u'externalDocs': {},
         u"swagger": u"2.0",
     }
-    for file in files:
-        log.info('Parsing %s' % file)
-        abs_filename = path.abspath(file)
-        ch = WADLHandler(abs_filename, api_ref)
-        xml.sax.parse(file, ch)
-        for urlpath, apis in ch.apis.items():
-            output['paths'][urlpath].extend(apis)
-        output['definitions'].update(ch.schemas)
-
-    for ex_request, ex_response in examples:
-        for urlpath in output['paths']:
-            url_matcher = "^" + URL_TEMPLATE_RE.sub('[^/]+', urlpath) + "$"
-            method = ex_request['method'].lower()
-            if re.match(url_matcher, ex_request['url']):
-                method_count = defaultdict(int)
-                for operation in output['paths'][urlpath]:
-                    method_count[operation['method'].lower()] += 1
-
-                if any(i > 1 for i in method_count.values()):
-                    # Skip any of the multi-payload endpoints.  They
-                    # are madness.
-                    break
-
-                for operation in output['paths'][urlpath]:
-                    if operation['method'].lower() == method:
-                        break
-                else:
-                    log.warning("Couldn't find any operations %s for %s",
-                                method, urlpath)
-                    break
-
-                request = HTTP_REQUEST_TMPL.render(
-                    headers=ex_request['headers'],
-                    method=ex_request['method'],
-                    url=ex_request['url'])
-                operation['examples'] = {'text/plain': request}
-
-                # Override any responses
-                status_code = ex_response['status_code']
-                response = HTTP_RESPONSE_TMPL.render(
-                    status_code=status_code,
-                    headers=ex_response['headers'],
-                    body=ex_response['body'] or '')
-                if status_code in operation['responses']:
-                    operation['responses'][status_code]['examples'] = \
-                        {'text/plain': response}
-                else:
-                    operation['responses'][status_code] = \
-                        {'examples': {'text/plain': response}}
-        else:
-            log.warning("Service %s %s doesn't have matching "
-                        "URL for example %s %s",
-                        output['info']['service'], output['info']['version'],
-                        method, ex_request['url'])
-
-    os.chdir(output_dir)
-    pathname = '%s-%s-swagger.json' % (api_ref['service'],
-                                       api_ref['version'])
-    with open(pathname, 'w') as out_file:
-        json.dump(output, out_file, indent=2, sort_keys=True)
+    # Parse on a pool, but always merge in the same order.
+    files = sorted(path.abspath(file) for file in files)
+    with timer.phase('parse_wadl'):
+        wadls = get_cache(cache_dir).parse_all(files, jobs=parse_jobs)
+    inputs = ([examples_file] if examples_file else []) + files
+    with timer.phase('tag_operations'):
+        for wadl in wadls:
+            inputs.extend(wadl.samples)
+            apis, schemas = wadl.operations(api_ref)
+            for urlpath, operations in apis.items():
+                output['paths'][urlpath].extend(operations)
+            output['definitions'].update(schemas)
+
+    with timer.phase('dedupe_schemas'):
+        renamed = dedupe_schemas(output, aliases=schema_aliases)
+    log.info('Merged %d identical schemas', len(renamed))
+
+    with timer.phase('match_examples'):
+        add_examples(output, examples)
+    if store_dir:
+        with timer.phase('store_examples'):
+            ExampleStore(store_dir).store_all(output, output_dir)
+    return output, inputs
+
+
+def main1(source_file, output_dir, cache_dir=None, parse_jobs=1,
+          schema_aliases=False, store_dir=None):
+    """Convert an api-ref file.
+
+    Returns the files read and written, and how many samples were read
+    and reused.
+    """
+    reads, hits = loaded_samples.counts()
+    log.info('Reading API description from %s' % source_file)
+    with timer.phase('read'):
+        api_ref = json.load(open(source_file))
+    examples_file = examples_filename(api_ref, path.dirname(source_file))
+    output, inputs = api_ref_to_swagger(api_ref, examples_file,
+                                        cache_dir=cache_dir,
+                                        parse_jobs=parse_jobs,
+                                        schema_aliases=schema_aliases,
+                                        store_dir=store_dir,
+                                        output_dir=output_dir)
+    pathname = path.join(output_dir, '%s-%s-swagger.json'
+                         % (api_ref['service'], api_ref['version']))
+    log.info("Writing %s", pathname)
+    with timer.phase('write'), open(pathname, 'w') as out_file:
+        json.dump(output, out_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    return ([source_file] + inputs, [pathname],
+            (loaded_samples.reads - reads, loaded_samples.hits - hits))
 
 
 def main():
     import argparse
+    import multiprocessing
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -943,11 +1390,40 @@ def main():
         '-v', '--verbose', action='count', default=0,
         help="Increase verbosity (specify multiple times for more)")
     parser.add_argument(
-        '-o', '--output-dir', action='store',
+        '-o', '--output-dir', action='store', default=os.curdir,
         help="The directory to output the JSON files too.")
     parser.add_argument(
-        'filename',
-        help="File to convert")
+        '-j', '--jobs', action='store', type=int,
+        default=multiprocessing.cpu_count(),
+        help="The number of files to convert in parallel.")
+    parser.add_argument(
+        '--cache-dir', action='store',
+        help="Keep parsed WADL files in this directory to reuse them "
+        "in later runs.")
+    parser.add_argument(
+        '--schema-aliases', action='store_true',
+        help="Keep a definition for every operation when identical "
+        "schemas are merged, referring to the merged one.")
+    parser.add_argument(
+        '--example-store', action='store',
+        help="Write the example payloads to files in this directory, "
+        "named by their content, and only refer to them in the swagger "
+        "files.")
+    parser.add_argument(
+        '--manifest', action='store',
+        help="Record the files each conversion used in this file, and "
+        "skip the conversions where none of them have changed.")
+    parser.add_argument(
+        '--timings', action='store',
+        help="Write the wall time, CPU time and peak memory of each "
+        "phase of each conversion to this JSON file.")
+    parser.add_argument(
+        '--profile', action='store',
+        help="Write a cProfile dump of each conversion to this file.")
+    parser.add_argument(
+        'filename', nargs='+',
+        help="Files to convert, directories are searched for "
+        "api-ref*.json files")
 
     args = parser.parse_args()
 
@@ -961,6 +1437,44 @@ def main():
         level=log_level,
         format='%(asctime)s %(name)s %(levelname)s %(message)s')
 
-    filename = path.abspath(args.filename)
-
-    main1(filename, output_dir=args.output_dir)
+    from fairy_slipper.cmd import batch
+    from fairy_slipper.cmd import timings
+
+    if args.profile and args.jobs > 1:
+        log.info('Converting in one process to profile it')
+        args.jobs = 1
+    filenames = batch.find_files(args.filename, 'api-ref*.json')
+    if args.manifest:
+        from fairy_slipper.cmd.manifest import Manifest
+
+        tool = 'wadl_to_swagger'
+        store_dir = None
+        if args.example_store:
+            store_dir = path.abspath(args.example_store)
+        settings = {'output_dir': path.abspath(args.output_dir),
+                    'schema_aliases': args.schema_aliases,
+                    'example_store': store_dir}
+        manifest = Manifest(args.manifest)
+        filenames = manifest.outdated(tool, filenames, settings)
+    start = time.time()
+    # Pool workers can't start pools of their own, so the WADL files
+    # of a book are only parsed in parallel when there is one book.
+    with timings.collect(args.timings, args.profile):
+        results = batch.run(main1, filenames, jobs=args.jobs,
+                            output_dir=args.output_dir,
+                            cache_dir=args.cache_dir,
+                            schema_aliases=args.schema_aliases,
+                            store_dir=args.example_store,
+                            parse_jobs=(args.jobs if len(filenames) == 1
+                                        else 1))
+    if args.manifest:
+        manifest.record_results(tool, results, settings)
+        manifest.save()
+    counts = [result.value[2] for result in results if not result.failed]
+    log.info("Read %d sample files, reused them %d times",
+             sum(reads for reads, hits in counts),
+             sum(hits for reads, hits in counts))
+    if len(results) > 1 or any(result.failed for result in results):
+        batch.print_summary(results, time.time() - start)
+    if any(result.failed for result in results):
+        return 1
@@ -0,0 +1,260 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Drive the SAX content handlers from a faster XML parser.
+
+The converters are written as :class:`xml.sax.ContentHandler`
+subclasses.  :func:`parse` feeds them the same ``startElement``,
+``endElement`` and ``characters`` events :func:`xml.sax.parse` would,
+using one of these backends:
+
+``expat``
+  Drives :mod:`pyexpat` directly, without the :mod:`xml.sax` reader
+  in between.  This is the same parser with the same buffering, so
+  the events are identical.  The default.
+
+``lxml``
+  Uses :func:`lxml.etree.iterparse`, if lxml is installed.  libxml2
+  resolves entity references and CDATA sections into the surrounding
+  text, where expat reports them as separate chunks, and the
+  handlers' whitespace rules can format that text differently.  It
+  also rejects undeclared namespace prefixes.  So it has to be
+  selected explicitly.
+
+``sax``
+  Plain :func:`xml.sax.parse`.
+
+The backend can be chosen with the ``FAIRY_SLIPPER_XML_BACKEND``
+environment variable.
+"""
+
+from __future__ import unicode_literals
+
+from collections import defaultdict
+import os
+import re
+import xml.sax
+
+BACKENDS = ('expat', 'lxml', 'sax')
+
+DEFAULT_BACKEND = 'expat'
+
+# The read size of xml.sax's expat reader, expat splits character
+# data at buffer boundaries so this has to match.
+BUFFER_SIZE = 2 ** 16 - 20
+
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+NEWLINE_RE = re.compile('(\n)')
+
+
+def get_backend(backend=None):
+    backend = backend or os.environ.get('FAIRY_SLIPPER_XML_BACKEND',
+                                        DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError("Unknown XML backend %s" % backend)
+    if backend == 'lxml' and not have_lxml():
+        raise ValueError("The lxml backend needs lxml installed")
+    return backend
+
+
+def have_lxml():
+    try:
+        import lxml.etree  # noqa
+    except ImportError:
+        return False
+    return True
+
+
+def open_source(source):
+    """Return a file like object and whether it needs closing."""
+    from xml.sax import saxutils
+
+    source = saxutils.prepare_input_source(source)
+    stream = source.getCharacterStream() or source.getByteStream()
+    if stream is not None:
+        return stream, False
+    return open(source.getSystemId(), 'rb'), True
+
+
+def parse(source, handler, backend=None):
+    """Parse source, sending the events to a SAX content handler.
+
+    ``source`` can be anything :func:`xml.sax.parse` accepts.
+    """
+    backend = get_backend(backend)
+    if backend == 'sax':
+        xml.sax.parse(source, handler)
+        return
+    stream, close = open_source(source)
+    try:
+        if backend == 'lxml':
+            parse_lxml(stream, handler)
+        else:
+            parse_expat(stream, handler)
+    finally:
+        if close:
+            stream.close()
+
+
+def parse_expat(stream, handler):
+    from xml.parsers import expat
+
+    parser = expat.ParserCreate()
+    parser.SetParamEntityParsing(
+        expat.XML_PARAM_ENTITY_PARSING_UNLESS_STANDALONE)
+    parser.StartElementHandler = handler.startElement
+    parser.EndElementHandler = handler.endElement
+    parser.CharacterDataHandler = handler.characters
+    handler.startDocument()
+    data = stream.read(BUFFER_SIZE)
+    while data:
+        parser.Parse(data, False)
+        data = stream.read(BUFFER_SIZE)
+    parser.Parse(b'', True)
+    handler.endDocument()
+
+
+def qualified_name(name, prefixes):
+    """Return the ``prefix:local`` form of a ``{uri}local`` name."""
+    if name[0] != '{':
+        return name
+    uri, local = name[1:].split('}', 1)
+    prefix = prefixes.get(uri)
+    if prefix:
+        return '%s:%s' % (prefix, local)
+    return local
+
+
+def send_text(handler, text):
+    """Send text in the chunks expat would, one per line break."""
+    if not text:
+        return
+    for chunk in NEWLINE_RE.split(text):
+        if chunk:
+            handler.characters(chunk)
+
+
+def parse_lxml(stream, handler):
+    from lxml import etree
+
+    handler.startDocument()
+    # The text and tail of a node are only complete once the next
+    # event has been read, so they are sent one event behind.
+    pending = None
+    for event, node in etree.iterparse(
+            stream, events=('start', 'end', 'comment', 'pi')):
+        if pending is not None:
+            pending_node, attr = pending
+            send_text(handler, getattr(pending_node, attr))
+            if attr == 'tail' and pending_node.getparent() is not None:
+                # Nothing else needs this node, free the memory.
+                del pending_node.getparent()[0]
+        if event == 'start':
+            handler.startElement(node_name(node), node_attributes(node))
+            pending = (node, 'text')
+        elif event == 'end':
+            handler.endElement(node_name(node))
+            pending = (node, 'tail')
+        else:
+            pending = (node, 'tail')
+    handler.endDocument()
+
+
+def node_name(node):
+    local = node.tag.rsplit('}', 1)[-1]
+    if node.prefix:
+        return '%s:%s' % (node.prefix, local)
+    return local
+
+
+def node_attributes(node):
+    # Attributes don't take the default namespace, so any prefix
+    # bound to the URI is the right one.
+    prefixes = {XML_NAMESPACE: 'xml'}
+    for prefix, uri in node.nsmap.items():
+        if prefix:
+            prefixes.setdefault(uri, prefix)
+    attrs = {}
+    # Like expat, without namespace processing the declarations are
+    # attributes too.
+    parent = node.getparent()
+    parent_nsmap = parent.nsmap if parent is not None else {}
+    for prefix, uri in node.nsmap.items():
+        if parent_nsmap.get(prefix) != uri:
+            attrs['xmlns:' + prefix if prefix else 'xmlns'] = uri
+    for name, value in node.attrib.items():
+        attrs[qualified_name(name, prefixes)] = value
+    return attrs
+
+
+class ElementStack(object):
+    """The open elements of a document, for content handlers.
+
+    Along with the stacks of element names and attributes it keeps the
+    attributes of the open elements by name, so finding the nearest
+    ancestor with a given name doesn't scan the stack.
+    """
+
+    def reset_stack(self):
+        self.tag_stack = []
+        self.attr_stack = []
+        self.open_elements = defaultdict(list)
+
+    def push_element(self, name, attrs):
+        self.tag_stack.append(name)
+        self.attr_stack.append(attrs)
+        self.open_elements[name].append(attrs)
+
+    def pop_element(self):
+        name = self.tag_stack.pop()
+        self.attr_stack.pop()
+        self.open_elements[name].pop()
+        return name
+
+    def search_stack_for(self, tag_name):
+        attrs = self.open_elements.get(tag_name)
+        if attrs:
+            return attrs[-1]
+
+    def count_open(self, tag_name):
+        return len(self.open_elements.get(tag_name, ()))
+
+    def on_top_tag_stack(self, *args):
+        stack = self.tag_stack
+        if len(args) > len(stack):
+            return False
+        if len(args) == 1:
+            return stack[-1] == args[0]
+        for offset, name in enumerate(reversed(args), 1):
+            if stack[-offset] != name:
+                return False
+        return True
+
+
+# The dispatch tables of each content handler class.
+dispatch_tables = {}
+
+
+def dispatch_table(cls, prefix):
+    """Return the methods of cls named ``prefix + name`` keyed by name."""
+    key = (cls, prefix)
+    if key not in dispatch_tables:
+        dispatch_tables[key] = dict(
+            (name[len(prefix):], getattr(cls, name))
+            for name in dir(cls) if name.startswith(prefix))
+    return dispatch_tables[key]
@@ -20,7 +20,6 @@ import json
 import logging
 from os import path
 
-import docutils.core
 from pecan import conf
 from pecan import expose
 from pecan import response
@@ -28,7 +27,7 @@ from webob.exc import status_map
 from webob.static import FileIter
 
 from fairy_slipper import hooks
-from fairy_slipper.rest import JSONWriter
+from fairy_slipper import rest
 
 logger = logging.getLogger(__name__)
 
@@ -37,8 +36,9 @@ class JSONFileController(object):
 
     __hooks__ = [hooks.CORSHook()]
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, checksum=None):
         self.filepath = filepath
+        self.checksum = checksum
 
     @expose('json')
     @expose(content_type='text/plain')
@@ -50,6 +50,12 @@ class JSONFileController(object):
         if not path.exists(self.filepath):
             response.status = 404
             return response
+        etag = self.checksum and self.checksum(self.filepath)
+        if etag:
+            # The content hash stays the same as long as the converted
+            # file does, so clients can keep using their copy.
+            response.etag = etag
+            response.conditional_response = True
         response.app_iter = FileIter(open(self.filepath, 'rb'))
         return response
 
@@ -65,13 +71,38 @@ class DocController(object):
         self.tags_rst = base_filepath + '-tags.rst'
         self.examples_dir = path.join(base_filepath, 'examples') + path.sep
         self.schema_dir = base_filepath + path.sep
+        self.service_dir = path.dirname(base_filepath)
+        self.checksums_file = base_filepath + '.sha256'
+        self.checksums = {}
+        self.checksums_key = None
         if not path.exists(self.api_rst):
             logger.warning("Can't find ReST API doc at %s", self.api_rst)
         if not path.exists(self.tags_rst):
             logger.warning("Can't find ReST TAG doc at %s", self.tags_rst)
-
-    @expose('json')
-    def index(self):
+        self.rendered = None
+        self.rendered_key = None
+        cache_dir = getattr(conf.app, 'render_cache_dir', None)
+        if cache_dir:
+            self.render_cache = rest.RenderCache(cache_dir)
+        else:
+            self.render_cache = None
+
+    def checksum(self, filepath):
+        """Return the sha256 of a file from the .sha256 file next to it."""
+        key = (path.getmtime(self.checksums_file)
+               if path.exists(self.checksums_file) else None)
+        if key != self.checksums_key:
+            self.checksums = {}
+            if key is not None:
+                with open(self.checksums_file) as checksums_file:
+                    for line in checksums_file:
+                        checksum, filename = line.rstrip('\n').split('  ', 1)
+                        filename = path.join(self.service_dir, filename)
+                        self.checksums[path.abspath(filename)] = checksum
+            self.checksums_key = key
+        return self.checksums.get(path.abspath(filepath))
+
+    def render(self):
         if path.exists(self.tags_rst) and path.exists(self.api_rst):
             rst = open(self.api_rst).read() + \
                 "\n\n" + open(self.tags_rst).read()
@@ -79,13 +110,26 @@ class DocController(object):
             rst = open(self.api_rst).read()
         else:
             logger.warning("Can't find ReST documents to render.")
-            return {}
+            return None
 
-        json = docutils.core.publish_string(rst, writer=JSONWriter())
+        # The compact form keeps the cached documents of every
+        # service small, it's converted back to JSON per request.
+        return rest.publish_string(rst, compact=True,
+                                   cache=self.render_cache)
+
+    @expose('json')
+    def index(self):
+        key = tuple(path.getmtime(f) if path.exists(f) else None
+                    for f in (self.api_rst, self.tags_rst))
+        if key != self.rendered_key:
+            self.rendered = self.render()
+            self.rendered_key = key
+        if self.rendered is None:
+            return {}
 
         return {'info': self.service_info,
-                'paths': json['paths'],
-                'tags': json['tags']}
+                'paths': rest.to_json(self.rendered['paths']),
+                'tags': rest.to_json(self.rendered['tags'])}
 
     @expose()
     def _lookup(self, *components):
@@ -95,12 +139,12 @@ class DocController(object):
         if components[0] == 'examples':
             example = components[1]
             filepath = path.join(self.examples_dir, example)
-            return JSONFileController(filepath), []
+            return JSONFileController(filepath, self.checksum), []
         else:
             filename = components[0]
             print(filename)
             filepath = path.join(self.schema_dir, filename)
-            return JSONFileController(filepath), []
+            return JSONFileController(filepath, self.checksum), []
 
 
 class ServicesController(object):
@@ -15,9 +15,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
+from collections import defaultdict
+from collections import OrderedDict
 import logging
+import multiprocessing
 import operator
 import textwrap
+import time
 
 import docutils.core
 from pecan import expose
@@ -30,38 +35,190 @@ from paste.deploy import util as paste_util
 
 LOG = logging.getLogger(__name__)
 
+# Rendered docstrings keyed by (module, class, action), each entry
+# holds the hash of the docstring it was rendered from.  The least
+# recently used entries are dropped past DOCSTRING_CACHE_SIZE.
+DOCSTRING_CACHE = OrderedDict()
+
+DOCSTRING_CACHE_SIZE = 2048
+
+
+def publish_docstring(doc):
+    """Render a docstring, returning the JSON and the time it took."""
+    start = time.time()
+    json = docutils.core.publish_parts(
+        textwrap.dedent(doc),
+        writer=JSONWriter())
+    return json, time.time() - start
+
+
+def render_docstrings(actions, workers=None):
+    """Return the docstrings of controller actions rendered as JSON.
+
+    ``actions`` is a list of ``(controller, action)`` pairs, the
+    renders are returned in the same order.  Renders are memoized by
+    the action and the hash of its docstring, so only docstrings that
+    have changed are passed to docutils again, and replace the render
+    of the old docstring.  If ``workers`` is more than one the renders
+    are spread over a pool of processes.
+    """
+    results = [None] * len(actions)
+    pending = []
+    for index, (controller, action) in enumerate(actions):
+        doc = getattr(controller, action).__doc__
+        if not doc:
+            continue
+        key = (controller.__class__.__module__,
+               controller.__class__.__name__,
+               action)
+        doc_hash = hash(doc)
+        cached = DOCSTRING_CACHE.pop(key, None)
+        if cached is not None and cached[0] == doc_hash:
+            # Mark the entry as recently used.
+            DOCSTRING_CACHE[key] = cached
+            results[index] = cached[1]
+        else:
+            pending.append((index, key, doc_hash, doc))
+
+    docs = [doc for index, key, doc_hash, doc in pending]
+    if workers and workers > 1 and len(docs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(docs)))
+        try:
+            rendered = pool.map(publish_docstring, docs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        rendered = [publish_docstring(doc) for doc in docs]
+
+    for pending_render, (json, elapsed) in zip(pending, rendered):
+        index, key, doc_hash, doc = pending_render
+        LOG.debug("Rendered docstring of %s.%s:%s in %.3fs",
+                  key[0], key[1], key[2], elapsed)
+        DOCSTRING_CACHE[key] = (doc_hash, json)
+        results[index] = json
+    while len(DOCSTRING_CACHE) > DOCSTRING_CACHE_SIZE:
+        DOCSTRING_CACHE.popitem(last=False)
+    return results
+
+
+def render_docstring(controller, action):
+    """Return the docstring of a controller action rendered as JSON."""
+    return render_docstrings([(controller, action)])[0]
+
 
 class VersionAPIController(object):
 
-    def __init__(self, versions):
+    def __init__(self, versions, workers=None):
         self.versions = versions
+        self.workers = workers
+        self.controllers = {}
 
     @expose()
     def _lookup(self, id_, *remainder):
         LOG.error(id_)
         if id_ in self.versions:
-            return DocSpecController(id_, self.versions[id_]), remainder
+            # Loading the router is expensive, so hold on to the
+            # controller and the routes it has already rendered.
+            if id_ not in self.controllers:
+                self.controllers[id_] = DocSpecController(
+                    id_, self.versions[id_], workers=self.workers)
+            return self.controllers[id_], remainder
 
     @expose(generic=True, template='json')
     def index(self):
         return self.versions.keys()
 
 
+class RouteTable(object):
+    """The documented routes of a router, indexed for lookups.
+
+    Routes are kept sorted by classpath, and indexed by classpath
+    (both ``module.Class:action`` and ``module.Class``), HTTP method
+    and routepath so that :meth:`filter` doesn't need to scan them.
+    """
+
+    def __init__(self, routes):
+        self.routes = sorted(routes, key=operator.itemgetter('classpath'))
+        self.by_classpath = defaultdict(list)
+        self.by_method = defaultdict(list)
+        # Routes without a method condition match any method.
+        self.any_method = []
+        for index, route in enumerate(self.routes):
+            classpath = route['classpath']
+            self.by_classpath[classpath].append(index)
+            self.by_classpath[classpath.split(':', 1)[0]].append(index)
+            methods = (route['conditions'] or {}).get('method')
+            if methods:
+                for method in methods:
+                    self.by_method[method.upper()].append(index)
+            else:
+                self.any_method.append(index)
+        self.by_path = sorted((route['routepath'], index)
+                              for index, route in enumerate(self.routes))
+        self.paths = [routepath for routepath, index in self.by_path]
+
+    def with_prefix(self, prefix):
+        start = bisect.bisect_left(self.paths, prefix)
+        for routepath, index in self.by_path[start:]:
+            if not routepath.startswith(prefix):
+                break
+            yield index
+
+    def filter(self, classpath=None, method=None, prefix=None):
+        """Return the routes matching all of the given filters."""
+        if classpath is None and method is None and prefix is None:
+            return self.routes
+        matches = None
+        if classpath is not None:
+            matches = set(self.by_classpath.get(classpath, ()))
+        if method is not None:
+            indexes = set(self.by_method.get(method.upper(), ()))
+            indexes.update(self.any_method)
+            matches = indexes if matches is None else matches & indexes
+        if prefix is not None:
+            indexes = set(self.with_prefix(prefix))
+            matches = indexes if matches is None else matches & indexes
+        return [self.routes[index] for index in sorted(matches)]
+
+
 class DocSpecController(HookController):
 
     __hooks__ = [hooks.CORSHook()]
 
-    def __init__(self, version, router):
+    def __init__(self, version, router, workers=None):
         # TODO(RS) this had to be hardcoded, to match the murano
         # factory method.  Perhaps there is a better way to get it to
         # work using the factory?
         self.version = version
+        self.workers = workers
         self.api = paste_util.lookup_object(router)(routes.Mapper())
+        self.table = None
         super(DocSpecController, self).__init__()
 
     @expose(generic=True, template='json')
-    def index(self):
+    def index(self, classpath=None, method=None, prefix=None):
+        if self.table is None:
+            self.table = RouteTable(self.build_routes())
+        return self.table.filter(classpath=classpath,
+                                 method=method,
+                                 prefix=prefix)
+
+    def build_routes(self):
+        routes, actions = self.find_routes()
+        rendered = render_docstrings(actions, workers=self.workers)
+        for route, json in zip(routes, rendered):
+            if json:
+                route.update(json)
+        return routes
+
+    def find_routes(self):
+        """Return the routes and the ``(controller, action)`` of each.
+
+        The docstrings of the actions aren't rendered.
+        """
         routes = {}
+        actions = {}
         for route in self.api.map.matchlist:
             if 'controller' not in route.defaults:
                 continue
@@ -86,17 +243,11 @@ class DocSpecController(HookController):
             routes[key]['req'] = route.reqs
             routes[key]['action'] = action
             routes[key]['conditions'] = route.conditions
-            doc = getattr(controller, action).__doc__
-            if doc:
-                json = docutils.core.publish_parts(
-                    textwrap.dedent(doc),
-                    writer=JSONWriter())
-                routes[key].update(json)
+            actions[key] = (controller, action)
             routes[key]['classpath'] = '.'.join(
                 [controller.__class__.__module__,
                  controller.__class__.__name__]
             ) + ':' + getattr(controller, action).__name__
 
-        routes = sorted(routes.values(),
-                        key=operator.itemgetter('classpath'))
-        return routes
+        keys = list(routes)
+        return [routes[key] for key in keys], [actions[key] for key in keys]
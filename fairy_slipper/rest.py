@@ -17,7 +17,21 @@
 
 from __future__ import unicode_literals
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import hashlib
+import json
 import logging
+import os
+from os import path
+import re
+import tempfile
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
 
 import docutils.core
 from docutils import nodes
@@ -29,6 +43,13 @@ import six
 
 logger = logging.getLogger(__name__)
 
+# The top level directives iter_operations parses one at a time.
+DIRECTIVE_RE = re.compile(r'\.\. (http:\w+|swagger:tag)::')
+
+# Top level hyperlink targets and substitution definitions, which
+# any of the directives might refer to.
+DEFINITION_RE = re.compile(r'\.\. (_|\|)')
+
 
 MIME_MAP = {
     'json': 'application/json',
@@ -587,6 +608,8 @@ class JSONWriter(writers.Writer):
     def __init__(self):
         writers.Writer.__init__(self)
         self.translator_class = JSONTranslator
+        # Any document written with this writer will need them.
+        register_directives()
 
     def translate(self):
         self.visitor = visitor = self.translator_class(self.document)
@@ -825,16 +848,6 @@ class HTTPCopy(Resource):
     method = 'copy'
 
 
-directives.register_directive('http:get', HTTPGet)
-directives.register_directive('http:post', HTTPPost)
-directives.register_directive('http:put', HTTPPut)
-directives.register_directive('http:patch', HTTPPatch)
-directives.register_directive('http:options', HTTPOptions)
-directives.register_directive('http:head', HTTPHead)
-directives.register_directive('http:delete', HTTPDelete)
-directives.register_directive('http:copy', HTTPCopy)
-
-
 class swagger_tag(nodes.Inline, nodes.TextElement):
     pass
 
@@ -875,7 +888,29 @@ class SwaggerTag(Directive):
         return [node]
 
 
-directives.register_directive('swagger:tag', SwaggerTag)
+DIRECTIVES = {
+    'http:get': HTTPGet,
+    'http:post': HTTPPost,
+    'http:put': HTTPPut,
+    'http:patch': HTTPPatch,
+    'http:options': HTTPOptions,
+    'http:head': HTTPHead,
+    'http:delete': HTTPDelete,
+    'http:copy': HTTPCopy,
+    'swagger:tag': SwaggerTag,
+}
+
+directives_registered = False
+
+
+def register_directives():
+    """Register the ReST directives with docutils, on first use only."""
+    global directives_registered
+    if directives_registered:
+        return
+    for name, directive in DIRECTIVES.items():
+        directives.register_directive(name, directive)
+    directives_registered = True
 
 
 class error_writer(object):
@@ -884,8 +919,361 @@ class error_writer(object):
         logger.warning(line.strip())
 
 
-def publish_string(string):
+class StreamingJSONTranslator(JSONTranslator):
+    """A translator that hands off each operation and tag once parsed.
+
+    Rather than accumulating every resource into ``output`` the
+    finished operations and tags are moved onto ``events`` as each
+    directive is departed, so they can be consumed incrementally.
+    """
+
+    def __init__(self, document):
+        JSONTranslator.__init__(self, document)
+        self.events = []
+        self.paths_stack = []
+
+    def visit_resource(self, node):
+        JSONTranslator.visit_resource(self, node)
+        self.paths_stack.append(self.node_stack[-1])
+
+    def depart_resource(self, node):
+        JSONTranslator.depart_resource(self, node)
+        paths = self.paths_stack.pop()
+        for url_path, operations in paths.items():
+            for operation in operations:
+                self.events.append(('path', url_path, operation))
+        paths.clear()
+
+    def depart_swagger_tag(self, node):
+        JSONTranslator.depart_swagger_tag(self, node)
+        tag = self.node_stack[-1]['tags'].pop()
+        self.events.append(('tag', tag['name'], tag))
+
+
+_UNSET = object()
+
+EMPTY_LIST = ()
+
+EMPTY_MAP = MappingProxyType({})
+
+
+def intern_value(value, strings):
+    """Return the copy of a string, or strings, shared through ``strings``.
+
+    ``strings`` is a dict that lives for one :func:`compact_output`
+    call, so the shared copies are dropped with the document.
+    """
+    if isinstance(value, six.string_types):
+        return strings.setdefault(value, value)
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return EMPTY_LIST
+        return tuple(intern_value(v, strings) for v in value)
+    return compact_value(value)
+
+
+def compact_value(value):
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return EMPTY_LIST
+        return tuple(compact_value(v) for v in value)
+    if isinstance(value, Mapping):
+        if not value:
+            return EMPTY_MAP
+        return dict((k, compact_value(v)) for k, v in value.items())
+    return value
+
+
+class CompactRecord(object):
+    """A read-only, slotted stand in for a translated JSON object.
+
+    ``keys`` lists the JSON keys stored in the matching slots, any
+    other keys found in the source object are kept in ``extra``.  The
+    values of the keys in ``interned`` are drawn from a small
+    vocabulary and are shared through ``strings``.
+    """
+
+    __slots__ = ('extra',)
+    keys = ()
+    slots = ()
+    interned = ()
+
+    def __init__(self, data, strings):
+        data = dict(data)
+        for key, slot in zip(self.keys, self.slots):
+            value = data.pop(key, _UNSET)
+            if value is not _UNSET:
+                value = self.compact_field(key, value, strings)
+            setattr(self, slot, value)
+        self.extra = compact_value(data) if data else None
+
+    def compact_field(self, key, value, strings):
+        if key in self.interned:
+            return intern_value(value, strings)
+        return compact_value(value)
+
+    def __json__(self):
+        return to_json(self)
+
+
+class CompactParameter(CompactRecord):
+    __slots__ = ('name', 'in_', 'description', 'type', 'required',
+                 'schema')
+    keys = ('name', 'in', 'description', 'type', 'required', 'schema')
+    slots = __slots__
+    interned = ('in', 'type')
+
+
+class CompactResponse(CompactRecord):
+    __slots__ = ('description', 'examples')
+    keys = slots = __slots__
+    interned = ('description',)
+
+
+class CompactTag(CompactRecord):
+    __slots__ = ('name', 'description', 'summary')
+    keys = slots = __slots__
+    interned = ('name',)
+
+
+class CompactOperation(CompactRecord):
+    __slots__ = ('method', 'title', 'summary', 'description', 'tags',
+                 'produces', 'consumes', 'parameters', 'responses',
+                 'examples')
+    keys = slots = __slots__
+    interned = ('method', 'tags', 'produces', 'consumes')
+
+    def compact_field(self, key, value, strings):
+        if key == 'parameters':
+            if not value:
+                return EMPTY_LIST
+            return tuple(CompactParameter(p, strings) for p in value)
+        if key == 'responses':
+            if not value:
+                return EMPTY_MAP
+            return dict((intern_value(status_code, strings),
+                         CompactResponse(r, strings))
+                        for status_code, r in value.items())
+        return CompactRecord.compact_field(self, key, value, strings)
+
+
+def compact_output(output):
+    """Convert translator output into its compact form.
+
+    Mimetypes, parameter types and locations, status codes and
+    descriptions and tag names are shared within the document, empty
+    containers are shared and operations, parameters, responses and
+    tags become ``__slots__`` records.  Use :func:`to_json` to get
+    plain JSON types back.
+    """
+    strings = {}
+    paths = dict((url_path,
+                  tuple(CompactOperation(o, strings) for o in operations))
+                 for url_path, operations in output['paths'].items())
+    result = dict((k, compact_value(v))
+                  for k, v in output.items()
+                  if k not in ('paths', 'tags'))
+    result['paths'] = paths
+    result['tags'] = tuple(CompactTag(t, strings) for t in output['tags'])
+    return result
+
+
+def to_json(value):
+    """Convert compact values back into plain JSON types."""
+    if isinstance(value, CompactRecord):
+        result = {}
+        for key, slot in zip(value.keys, value.slots):
+            field = getattr(value, slot)
+            if field is not _UNSET:
+                result[key] = to_json(field)
+        if value.extra:
+            result.update(to_json(value.extra))
+        return result
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, Mapping):
+        return dict((k, to_json(v)) for k, v in value.items())
+    return value
+
+
+# Bump when the format of the cache entries changes.  Changes to the
+# translator are caught by hashing its source into every key.
+CACHE_FORMAT = '1'
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# The store is scanned for its size after this many writes, to pick
+# up the entries written by other processes.
+CACHE_SCAN_INTERVAL = 100
+
+
+def source_hash():
+    """Return a hash of the source of this module."""
+    filename = path.splitext(__file__)[0] + '.py'
+    with open(filename, 'rb') as source_file:
+        return hashlib.sha256(source_file.read()).hexdigest()
+
+
+class RenderCache(object):
+    """An on-disk store of translated ReST documents.
+
+    Entries are keyed by a hash of the ReST source and written
+    atomically, so any number of processes can share ``directory``.
+    When the store grows past ``max_size`` bytes the least recently
+    used entries are removed.  The size of the store is kept in memory
+    between writes and only scanned for again every
+    ``CACHE_SCAN_INTERVAL`` writes, or once it looks too big.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.version = CACHE_FORMAT + source_hash()
+        self.size = None
+        self.writes = 0
+
+    def key(self, string):
+        if isinstance(string, six.text_type):
+            string = string.encode('utf-8')
+        digest = hashlib.sha256(self.version.encode('ascii'))
+        digest.update(string)
+        return digest.hexdigest()
+
+    def filepath(self, key):
+        return path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, key):
+        filepath = self.filepath(key)
+        try:
+            with open(filepath) as cache_file:
+                output = json.load(cache_file)
+            # Mark the entry as recently used.
+            os.utime(filepath, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return output
+
+    def set(self, key, output):
+        filepath = self.filepath(key)
+        dirname = path.dirname(filepath)
+        try:
+            if not path.exists(dirname):
+                os.makedirs(dirname)
+        except OSError:
+            # Another writer may have just created it.
+            if not path.isdir(dirname):
+                raise
+        fd, tmp_filepath = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(output, tmp_file)
+                size = tmp_file.tell()
+            os.rename(tmp_filepath, filepath)
+        except (IOError, OSError):
+            logger.warning("Failed to write cache entry %s", filepath)
+            if path.exists(tmp_filepath):
+                os.unlink(tmp_filepath)
+            return
+        self.writes += 1
+        if self.size is None or self.writes % CACHE_SCAN_INTERVAL == 0:
+            self.size = None
+        else:
+            self.size += size
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries past ``max_size``."""
+        entries = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                filepath = path.join(dirpath, filename)
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filepath))
+                total += stat.st_size
+        if total > self.max_size:
+            for mtime, size, filepath in sorted(entries):
+                try:
+                    os.unlink(filepath)
+                except OSError:
+                    # Already removed by a concurrent eviction.
+                    pass
+                total -= size
+                if total <= self.max_size:
+                    break
+        self.size = total
+
+
+def publish_string(string, compact=False, cache=None):
+    """Translate a ReST document into a swagger like dictionary.
+
+    If ``cache`` is a :class:`RenderCache` it's checked before the
+    document is parsed, and updated afterwards.
+    """
+    output = None
+    if cache is not None:
+        key = cache.key(string)
+        output = cache.get(key)
+    if output is None:
+        settings_overrides = {'warning_stream': error_writer()}
+        output = docutils.core.publish_string(
+            string, writer=JSONWriter(),
+            settings_overrides=settings_overrides)
+        if cache is not None:
+            cache.set(key, output)
+    if compact:
+        return compact_output(output)
+    return output
+
+
+def split_directives(string):
+    """Split a ReST document at its top level directives.
+
+    Returns the source of each directive, with any text up to the next
+    one, and the hyperlink targets and substitution definitions of the
+    document, which every part needs to be parsed on its own.
+    """
+    lines = []
+    parts = [lines]
+    definitions = []
+    for line in string.splitlines(True):
+        if DEFINITION_RE.match(line):
+            lines = definitions
+        elif DIRECTIVE_RE.match(line) or (
+                lines is definitions and line[:1].strip()):
+            lines = []
+            parts.append(lines)
+        lines.append(line)
+    sources = [''.join(lines) for lines in parts]
+    return ([source for source in sources if source.strip()],
+            ''.join(definitions))
+
+
+def iter_operations(string):
+    """Yield the operations and tags of a ReST document as they finish.
+
+    Each item is a ``(kind, key, value)`` tuple, either ``('path',
+    url_path, operation)`` or ``('tag', tag_name, tag)``, in document
+    order.  The values are identical to the entries
+    :func:`publish_string` would have collected into ``paths`` and
+    ``tags``, but the document is parsed one top level directive at a
+    time, so only the document tree of the current directive is held
+    in memory.
+    """
+    register_directives()
     settings_overrides = {'warning_stream': error_writer()}
-    return docutils.core.publish_string(
-        string, writer=JSONWriter(),
-        settings_overrides=settings_overrides)
+    parts, definitions = split_directives(string)
+    for part in parts:
+        document = docutils.core.publish_doctree(
+            part + '\n' + definitions,
+            settings_overrides=settings_overrides)
+        visitor = StreamingJSONTranslator(document)
+        document.walkabout(visitor)
+        for event in visitor.events:
+            yield event
@@ -0,0 +1,83 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+import os
+import shutil
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import batch
+
+
+def touch(filename, content=''):
+    with open(filename, 'w') as f:
+        f.write(content)
+
+
+def fail_on_bad(filename, output_dir):
+    with open(filename) as f:
+        if f.read() == 'bad':
+            raise ValueError('bad file')
+    touch(os.path.join(output_dir, os.path.basename(filename) + '.out'))
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        os.mkdir(os.path.join(self.dir, 'sub'))
+        self.files = [os.path.join(self.dir, name)
+                      for name in ('api-ref-b.json',
+                                   'sub/api-ref-a.json',
+                                   'other.json')]
+        for filename in self.files:
+            touch(filename)
+
+    def test_find_files(self):
+        extra = os.path.join(self.dir, 'extra.json')
+        self.assertEqual(
+            batch.find_files([extra, self.dir], 'api-ref*.json'),
+            [extra, self.files[0], self.files[1]])
+
+    def check_run(self, jobs):
+        touch(self.files[0], 'bad')
+        results = batch.run(fail_on_bad, self.files, jobs=jobs,
+                            output_dir=self.dir)
+        self.assertEqual([result.filename for result in results],
+                         self.files)
+        self.assertEqual([result.failed for result in results],
+                         [True, False, False])
+        self.assertIn('ValueError: bad file', results[0].error)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.dir, 'other.json.out')))
+
+        stream = StringIO()
+        batch.print_summary(results, 1, stream)
+        self.assertIn('Converted 2 of 3 files', stream.getvalue())
+
+    def test_run(self):
+        self.check_run(1)
+
+    def test_run_pool(self):
+        self.check_run(2)
@@ -0,0 +1,278 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import build
+from fairy_slipper.cmd import docbkx_to_json
+from fairy_slipper.cmd.manifest import hash_file
+from fairy_slipper.cmd import swagger_to_rst
+from fairy_slipper.cmd import wadl_to_swagger
+
+BOOK = """<?xml version="1.0" encoding="UTF-8"?>
+<book xmlns="http://docbook.org/ns/docbook"
+      xmlns:xi="http://www.w3.org/2001/XInclude"
+      xml:id="%(id)s" version="1">
+  <xi:include href="%(chapter)s"/>
+</book>
+"""
+
+CHAPTER = """<?xml version="1.0" encoding="UTF-8"?>
+<chapter xmlns="http://docbook.org/ns/docbook"
+         xmlns:wadl="http://wadl.dev.java.net/2009/02">
+  <title>Things API v2 %(ext)s(CURRENT)</title>
+  <section xml:id="%(section)s">
+    <title>Things</title>
+    <para>Lists and shows <code>things</code>.</para>
+    <wadl:resources href="things.wadl"/>
+  </section>
+</chapter>
+"""
+
+WADL = """<?xml version="1.0" encoding="UTF-8"?>
+<application xmlns="http://wadl.dev.java.net/2009/02"
+             xmlns:wadl="http://wadl.dev.java.net/2009/02"
+             xmlns:xsdxt="http://docs.rackspacecloud.com/xsd-ext/v1.0">
+  <resources>
+    <resource id="things" path="v2/things">
+      <method href="#listThings" />
+      <resource id="thing" path="{thing_id}">
+        <param name="thing_id" style="template" type="xsd:string">
+          <wadl:doc><para>The thing.</para></wadl:doc>
+        </param>
+        <method href="#showThing" />
+      </resource>
+    </resource>
+  </resources>
+  <method name="GET" id="listThings">
+    <wadl:doc title="List things">
+      <para role="shortdesc">Lists things.</para>
+    </wadl:doc>
+    <response status="200">
+      <representation mediaType="application/json">
+        <wadl:doc><xsdxt:code href="things.json" /></wadl:doc>
+      </representation>
+    </response>
+  </method>
+  <method name="GET" id="showThing">
+    <wadl:doc title="Show thing">
+      <para role="shortdesc">Shows a <code>thing</code>.</para>
+    </wadl:doc>
+    <response status="200" />
+  </method>
+</application>
+"""
+
+EXAMPLES = [[
+    {'method': 'GET', 'url': 'v2/things/1',
+     'headers': {'Accept': 'application/json'}},
+    {'status_code': '200', 'headers': {}, 'body': '{"thing": {}}'},
+]]
+
+
+def touch(filename, content=''):
+    with open(filename, 'w') as f:
+        f.write(content)
+
+
+def read_tree(directory):
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            with open(filepath) as f:
+                files[os.path.relpath(filepath, directory)] = f.read()
+    return files
+
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        self.site = os.path.join(self.dir, 'api-site')
+        docbkx = os.path.join(self.site, 'api-ref', 'src', 'docbkx')
+        os.makedirs(docbkx)
+        for id, chapter, ext in [('things-v2', 'ch_things.xml', ''),
+                                 ('things-v2-ext', 'ch_things-ext.xml',
+                                  'Extensions ')]:
+            touch(os.path.join(docbkx, 'api-ref-%s.xml' % id),
+                  BOOK % {'id': id, 'chapter': chapter})
+            touch(os.path.join(docbkx, chapter),
+                  CHAPTER % {'ext': ext, 'section': id})
+        touch(os.path.join(docbkx, 'things.wadl'), WADL)
+        touch(os.path.join(docbkx, 'things.json'), '{"things": []}')
+        self.books = sorted(
+            os.path.join(docbkx, filename)
+            for filename in os.listdir(docbkx)
+            if filename.startswith('api-ref-'))
+
+        self.examples_dir = os.path.join(self.dir, 'examples')
+        os.mkdir(self.examples_dir)
+        touch(os.path.join(self.examples_dir, 'things-examples.json'),
+              json.dumps(EXAMPLES))
+
+    def convert_serially(self):
+        """Convert the books the way migrate.sh used to."""
+        conversion_files = os.path.join(self.dir, 'conversion_files')
+        output_dir = os.path.join(self.dir, 'chain')
+        os.mkdir(conversion_files)
+        os.mkdir(output_dir)
+        shutil.copy(os.path.join(self.examples_dir, 'things-examples.json'),
+                    conversion_files)
+        for book in self.books:
+            inputs, outputs = docbkx_to_json.main1(book, conversion_files)
+            outputs = wadl_to_swagger.main1(outputs[0], conversion_files)[1]
+            swagger_to_rst.main1(outputs[0], output_dir)
+        return read_tree(output_dir)
+
+    def test_find_books(self):
+        self.assertEqual(docbkx_to_json.find_books([self.site]), self.books)
+
+    def test_same_as_separate_tools(self):
+        expected = self.convert_serially()
+        self.assertIn('things/v2.rst', expected)
+        self.assertIn('things-extensions/v2/examples/showThing_req.txt',
+                      expected)
+        for jobs in (1, 2):
+            output_dir = os.path.join(self.dir, 'build%d' % jobs)
+            results = build.main1(self.books, output_dir, jobs=jobs,
+                                  examples_dir=self.examples_dir)
+            self.assertFalse(any(result.failed for result in results))
+            self.assertEqual(read_tree(output_dir), expected)
+
+    def test_intermediate_dir(self):
+        intermediate_dir = os.path.join(self.dir, 'intermediate')
+        build.main1(self.books, os.path.join(self.dir, 'out'),
+                    intermediate_dir=intermediate_dir)
+        self.assertEqual(sorted(os.listdir(intermediate_dir)),
+                         ['api-ref-things-extensions-v2.json',
+                          'api-ref-things-v2.json',
+                          'things-extensions-v2-swagger.json',
+                          'things-v2-swagger.json'])
+
+    def test_checksums(self):
+        output_dir = os.path.join(self.dir, 'out')
+        build.main1(self.books, output_dir, examples_dir=self.examples_dir)
+        service_path = os.path.join(output_dir, 'things')
+        with open(os.path.join(service_path, 'v2.sha256')) as f:
+            checksums = dict(reversed(line.split()) for line in f)
+        self.assertIn('v2.rst', checksums)
+        self.assertIn('v2/examples/listThings_resp_200.json', checksums)
+        for filename, checksum in checksums.items():
+            self.assertEqual(
+                hash_file(os.path.join(service_path, filename)), checksum)
+
+        # Converting the same books again gives the same bytes.
+        build.main1(self.books, os.path.join(self.dir, 'again'),
+                    examples_dir=self.examples_dir)
+        self.assertEqual(read_tree(os.path.join(self.dir, 'again')),
+                         read_tree(output_dir))
+
+    def test_manifest(self):
+        output_dir = os.path.join(self.dir, 'out')
+        manifest_file = os.path.join(self.dir, 'manifest.json')
+        results = build.main1(self.books, output_dir,
+                              manifest_file=manifest_file)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(build.main1(self.books, output_dir,
+                                     manifest_file=manifest_file), [])
+
+        # Both books use the WADL file.
+        wadl_to_swagger.loaded_samples.samples.clear()
+        touch(os.path.join(os.path.dirname(self.books[0]), 'things.json'),
+              '{"things": [1]}')
+        results = build.main1(self.books, output_dir,
+                              manifest_file=manifest_file)
+        self.assertEqual(len(results), 2)
+
+    def test_watcher(self):
+        output_dir = os.path.join(self.dir, 'out')
+        notify_file = os.path.join(self.dir, 'notify')
+        watcher = build.Watcher([self.site], output_dir, notify_file)
+        watcher.add_results(build.main1(self.books, output_dir))
+        self.assertEqual(watcher.poll(), [])
+        self.assertFalse(os.path.exists(notify_file))
+
+        # Only the book using the chapter is rebuilt.
+        chapter = os.path.join(os.path.dirname(self.books[0]),
+                               'ch_things-ext.xml')
+        with open(chapter) as f:
+            content = f.read()
+        touch(chapter, content.replace('Lists and shows', 'Shows'))
+        results = watcher.poll()
+        self.assertEqual([result.filename for result in results],
+                         [self.books[0]])
+        self.assertTrue(os.path.exists(notify_file))
+        with open(os.path.join(output_dir, 'things-extensions',
+                               'v2-tags.rst')) as f:
+            self.assertIn('Shows ``things``', f.read())
+
+        # A changed sample is read again.
+        touch(os.path.join(os.path.dirname(self.books[0]), 'things.json'),
+              '{"things": [1, 2]}')
+        self.assertEqual(len(watcher.poll()), 2)
+        with open(os.path.join(output_dir, 'things', 'v2', 'examples',
+                               'listThings_resp_200.json')) as f:
+            self.assertEqual(json.load(f), {'things': [1, 2]})
+
+    def test_watcher_chapters(self):
+        output_dir = os.path.join(self.dir, 'out')
+        watcher = build.Watcher([self.site], output_dir)
+        watcher.add_results(build.main1(self.books, output_dir,
+                                        chapters=watcher.chapters))
+        chapters = dict(watcher.chapters.chapters)
+        self.assertEqual(len(chapters), 2)
+
+        # A changed sample doesn't need the chapters parsed again.
+        touch(os.path.join(os.path.dirname(self.books[0]), 'things.json'),
+              '{"things": [1]}')
+        self.assertEqual(len(watcher.poll()), 2)
+        for filepath, chapter in chapters.items():
+            self.assertIs(watcher.chapters.chapters[filepath], chapter)
+
+        # A changed chapter is.
+        chapter = os.path.join(os.path.dirname(self.books[0]),
+                               'ch_things-ext.xml')
+        with open(chapter) as f:
+            content = f.read()
+        touch(chapter, content.replace('Lists and shows', 'Shows'))
+        watcher.poll()
+        self.assertIsNot(watcher.chapters.chapters[chapter],
+                         chapters[chapter])
+
+    def test_watcher_scan_interval(self):
+        output_dir = os.path.join(self.dir, 'out')
+        watcher = build.Watcher([self.site], output_dir, scan_interval=60)
+        watcher.add_results(build.main1(self.books, output_dir))
+        self.assertEqual(watcher.poll(), [])
+
+        # New books are only found when the sources are searched again.
+        docbkx = os.path.dirname(self.books[0])
+        book = os.path.join(docbkx, 'api-ref-things-v3.xml')
+        touch(book, BOOK % {'id': 'things-v3', 'chapter': 'ch_things.xml'})
+        self.assertEqual(watcher.poll(), [])
+        watcher.last_scan -= 60
+        self.assertEqual([result.filename for result in watcher.poll()],
+                         [book])
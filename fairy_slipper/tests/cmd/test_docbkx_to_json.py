@@ -18,11 +18,14 @@
 from __future__ import unicode_literals
 
 import os
+import shutil
 try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO
+import tempfile
 from unittest import TestCase
+from xml.parsers.expat import ExpatError
 import xml.sax
 
 from fairy_slipper.cmd import docbkx_to_json
@@ -121,3 +124,112 @@ class TestChapterParaParser(TestCase):
                 "  Para 3, listitem1\n\n- Para1, listitem2\n\nsome more para text"
             }]
         )
+
+
+class TestParseChapters(TestCase):
+
+    def parse(self, jobs):
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        file_content = """<?xml version="1.0" encoding="UTF-8"?>
+        <book xml:id="test-v1" version="1">
+        %s
+        </book>
+        """ % '\n'.join('<xi:include href="%s/%s"/>' % (test_dir, filename)
+                        for filename in ['ch_test-v3.xml', 'ch_test-v1.xml',
+                                         'ch_test-table.xml',
+                                         'ch_test-listitems.xml'])
+
+        ch = docbkx_to_json.APIRefContentHandler("test-file.xml", jobs=jobs)
+        xml.sax.parse(StringIO(file_content), ch)
+        return ch
+
+    def test_parallel(self):
+        serial = self.parse(jobs=1)
+        parallel = self.parse(jobs=2)
+        self.assertEqual([tag['name'] for tag in parallel.tags],
+                         ['test-v3', 'test-v1', 'table-v3', 'listitems-v1'])
+        for name in ('tags', 'method_tags', 'resource_tags', 'file_tags',
+                     'includes'):
+            self.assertEqual(getattr(parallel, name), getattr(serial, name))
+
+
+BOOK = """<?xml version="1.0" encoding="UTF-8"?>
+<book xmlns="http://docbook.org/ns/docbook"
+      xmlns:xi="http://www.w3.org/2001/XInclude"
+      xml:id="%(id)s" version="1">
+%(includes)s
+</book>
+"""
+
+CHAPTER = """<?xml version="1.0" encoding="UTF-8"?>
+<chapter xmlns="http://docbook.org/ns/docbook">
+  <title>Things API v2 (CURRENT)</title>
+  <section xml:id="%s">
+    <title>Things</title>
+    <para>Lists things.</para>
+  </section>
+</chapter>
+"""
+
+
+class TestChapterCache(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        for name in ('things', 'extensions'):
+            self.write('ch_%s.xml' % name, CHAPTER % name)
+        self.books = [
+            self.write('api-ref-things-v2.xml', BOOK % {
+                'id': 'things-v2',
+                'includes': '<xi:include href="ch_things.xml"/>'}),
+            self.write('api-ref-things-v2-ext.xml', BOOK % {
+                'id': 'things-v2-ext',
+                'includes': '<xi:include href="ch_things.xml"/>\n'
+                '<xi:include href="ch_extensions.xml"/>'}),
+        ]
+
+    def write(self, filename, content):
+        filepath = os.path.join(self.dir, filename)
+        with open(filepath, 'w') as f:
+            f.write(content)
+        return filepath
+
+    def convert(self, output_dir, chapters=None):
+        os.mkdir(output_dir)
+        outputs = {}
+        for book in self.books:
+            inputs, written = docbkx_to_json.main1(book, output_dir,
+                                                   chapters=chapters)
+            with open(written[0]) as f:
+                outputs[os.path.basename(written[0])] = f.read()
+        return outputs
+
+    def test_shared_chapters(self):
+        expected = self.convert(os.path.join(self.dir, 'serial'))
+        self.assertEqual(sorted(expected),
+                         ['api-ref-things-extensions-v2.json',
+                          'api-ref-things-v2.json'])
+
+        chapters = docbkx_to_json.ChapterCache()
+        docbkx_to_json.load_chapters(self.books, chapters, jobs=2)
+        self.assertEqual(sorted(chapters.chapters),
+                         [os.path.join(self.dir, 'ch_extensions.xml'),
+                          os.path.join(self.dir, 'ch_things.xml')])
+        self.assertEqual(self.convert(os.path.join(self.dir, 'cached'),
+                                      chapters), expected)
+        # Each chapter was parsed once, and reused by both books.
+        self.assertEqual(len(chapters.chapters), 2)
+        self.assertEqual(chapters.hits, 3)
+
+    def test_broken_chapter(self):
+        self.write('ch_extensions.xml', '<chapter>')
+        chapters = docbkx_to_json.ChapterCache()
+        docbkx_to_json.load_chapters(self.books, chapters)
+        self.assertEqual(list(chapters.chapters),
+                         [os.path.join(self.dir, 'ch_things.xml')])
+        output_dir = os.path.join(self.dir, 'out')
+        os.mkdir(output_dir)
+        docbkx_to_json.main1(self.books[0], output_dir, chapters=chapters)
+        self.assertRaises(ExpatError, docbkx_to_json.main1,
+                          self.books[1], output_dir, chapters=chapters)
@@ -0,0 +1,104 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+from copy import deepcopy
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import example_store
+from fairy_slipper.cmd import swagger_to_rst
+from fairy_slipper.tests.cmd.test_build import read_tree
+
+
+def operation(id, response_example):
+    return {
+        'id': id,
+        'examples': {'text/plain': 'GET /v2/things HTTP/1.1\n\n'},
+        'responses': {
+            '200': {'examples': {'application/json': response_example}},
+            '204': {'examples': {'application/json': {}}},
+        },
+    }
+
+
+SWAGGER = {
+    'info': {'service': 'things', 'version': 'v2'},
+    'paths': {
+        'v2/things': [operation('listThings', {'things': []})],
+        'v2/things/{id}': [operation('showThing', {'things': []})],
+    },
+}
+
+
+class TestExampleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.store_dir = os.path.join(self.dir, 'store')
+
+    def test_store_all(self):
+        swagger = deepcopy(SWAGGER)
+        responses = swagger['paths']['v2/things'][0]['responses']
+        examples = responses['200']['examples']
+        example_store.ExampleStore(self.store_dir).store_all(swagger,
+                                                             self.dir)
+
+        self.assertEqual(swagger[example_store.STORE_KEY], 'store')
+        self.assertEqual(examples, {'application/json': {'things': []}})
+        stored = responses['200']['examples']['application/json']
+        self.assertTrue(example_store.is_stored(stored))
+        self.assertTrue(stored[example_store.STORE_KEY].endswith('.json'))
+        # Empty examples stay in the document.
+        self.assertEqual(responses['204']['examples'],
+                         {'application/json': {}})
+        # The request and the response shared by both operations.
+        self.assertEqual(len(os.listdir(self.store_dir)), 2)
+
+    def test_write_examples(self):
+        inline_dir = os.path.join(self.dir, 'inline')
+        stored_dir = os.path.join(self.dir, 'stored')
+        swagger_to_rst.write_examples(deepcopy(SWAGGER), inline_dir)
+
+        swagger = deepcopy(SWAGGER)
+        example_store.ExampleStore(self.store_dir).store_all(swagger,
+                                                             self.dir)
+        swagger_to_rst.write_examples(swagger, stored_dir, self.dir)
+        self.assertEqual(read_tree(stored_dir), read_tree(inline_dir))
+
+        # Writing inline examples over linked ones leaves the store
+        # alone.
+        store = read_tree(self.store_dir)
+        changed = deepcopy(SWAGGER)
+        changed['paths']['v2/things'][0]['responses']['200']['examples'][
+            'application/json'] = {'things': [1]}
+        swagger_to_rst.write_examples(changed, stored_dir)
+        self.assertEqual(read_tree(self.store_dir), store)
+
+    def test_mode(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        store = example_store.ExampleStore(self.store_dir)
+        reference = store.add('application/json', {'things': []})
+        filepath = os.path.join(self.store_dir,
+                                reference[example_store.STORE_KEY])
+        self.assertEqual(stat.S_IMODE(os.stat(filepath).st_mode), 0o644)
@@ -0,0 +1,147 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import batch
+from fairy_slipper.cmd import docbkx_to_json
+from fairy_slipper.cmd import manifest
+
+BOOK = """<?xml version="1.0" encoding="UTF-8"?>
+<book xmlns="http://docbook.org/ns/docbook"
+      xmlns:xi="http://www.w3.org/2001/XInclude"
+      xml:id="test-v1" version="1">
+  <xi:include href="ch_test-v1.xml"/>
+</book>
+"""
+
+CHAPTER = """<?xml version="1.0" encoding="UTF-8"?>
+<chapter>
+  <title>Test API v1 (CURRENT)</title>
+  <section xml:id="things">
+    <title>Things</title>
+    <para>Lists things.</para>
+  </section>
+</chapter>
+"""
+
+
+def touch(filename, content=''):
+    with open(filename, 'w') as f:
+        f.write(content)
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.source = os.path.join(self.dir, 'source.txt')
+        self.input = os.path.join(self.dir, 'input.txt')
+        self.output = os.path.join(self.dir, 'output.txt')
+        self.manifest_file = os.path.join(self.dir, 'manifest.json')
+        touch(self.source, 'source')
+        touch(self.input, 'input')
+        touch(self.output, 'output')
+
+    def record(self, version='1', settings=None):
+        m = manifest.Manifest(self.manifest_file, version=version)
+        m.record('tool', self.source, [self.source, self.input],
+                 [self.output], settings)
+        m.save()
+
+    def is_current(self, version='1', settings=None):
+        m = manifest.Manifest(self.manifest_file, version=version)
+        return m.is_current('tool', self.source, settings)
+
+    def test_unchanged(self):
+        self.assertFalse(self.is_current())
+        self.record()
+        self.assertTrue(self.is_current())
+
+    def test_changed_input(self):
+        self.record()
+        touch(self.input, 'changed')
+        self.assertFalse(self.is_current())
+
+    def test_missing_output(self):
+        self.record()
+        os.unlink(self.output)
+        self.assertFalse(self.is_current())
+
+    def test_created_input(self):
+        os.unlink(self.input)
+        self.record()
+        self.assertTrue(self.is_current())
+        touch(self.input, 'input')
+        self.assertFalse(self.is_current())
+
+    def test_version_and_settings(self):
+        self.record(settings={'output_dir': self.dir})
+        self.assertTrue(self.is_current(settings={'output_dir': self.dir}))
+        self.assertFalse(self.is_current(version='2',
+                                         settings={'output_dir': self.dir}))
+        self.assertFalse(self.is_current())
+
+    def test_record_results(self):
+        m = manifest.Manifest(self.manifest_file, version='1')
+        m.record_results('tool', [
+            batch.Result(self.source, 0, value=([self.input],
+                                                [self.output])),
+            batch.Result(self.input, 0, error='Traceback')])
+        self.assertEqual(m.outdated('tool', [self.source, self.input]),
+                         [self.input])
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        self.chapter = os.path.join(self.dir, 'ch_test-v1.xml')
+        touch(self.chapter, CHAPTER)
+        self.book = os.path.join(self.dir, 'api-ref-test-v1.xml')
+        touch(self.book, BOOK)
+        self.output_dir = os.path.join(self.dir, 'out')
+        os.mkdir(self.output_dir)
+        self.manifest_file = os.path.join(self.dir, 'manifest.json')
+
+    def convert(self):
+        return manifest.convert('docbkx_to_json', docbkx_to_json.main1,
+                                self.book, self.output_dir,
+                                self.manifest_file)
+
+    def test_docbkx_to_json(self):
+        inputs, outputs = self.convert()
+        self.assertEqual(inputs, [self.book, self.chapter])
+        self.assertEqual(outputs, [os.path.join(self.output_dir,
+                                                'api-ref-test-v1.json')])
+        self.assertIsNone(self.convert())
+
+        with open(self.chapter, 'a') as chapter:
+            chapter.write('\n')
+        self.assertIsNotNone(self.convert())
+        self.assertIsNone(self.convert())
+
+        os.unlink(outputs[0])
+        self.assertIsNotNone(self.convert())
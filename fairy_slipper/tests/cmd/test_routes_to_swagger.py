@@ -0,0 +1,100 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import routes_to_swagger
+from fairy_slipper.controllers import routes_inspector
+
+ROUTER = 'fairy_slipper.tests.test_routes_inspector:Router'
+CONTROLLER = 'fairy_slipper.tests.test_routes_inspector.ServersController'
+
+
+class TestRoutesToSwagger(unittest.TestCase):
+
+    def test_swagger_path(self):
+        self.assertEqual(
+            routes_to_swagger.swagger_path('/servers/{id:[0-9]+}.:(format)'),
+            '/servers/{id}.{format}')
+
+    def test_routes_to_swagger(self):
+        routes, docs = routes_to_swagger.load_routes(ROUTER, 'v1')
+        swagger = routes_to_swagger.routes_to_swagger(routes, 'compute', 'v1')
+        self.assertEqual(swagger['info']['title'], 'compute')
+        self.assertEqual(swagger['tags'],
+                         [{'name': 'test_routes_inspector',
+                           'description': '',
+                           'summary': ''}])
+        self.assertEqual(sorted(swagger['paths']),
+                         ['/v1/servers', '/v1/servers/{id}'])
+        self.assertEqual(
+            [op['method'] for op in swagger['paths']['/v1/servers/{id}']],
+            ['delete', 'get'])
+        show = swagger['paths']['/v1/servers/{id}'][1]
+        self.assertEqual(show['id'], 'ServersController_show_get')
+        self.assertEqual(show['tags'], ['test_routes_inspector'])
+        self.assertEqual(show['summary'], '')
+        self.assertEqual(show['parameters'],
+                         [{'name': 'id',
+                           'in': 'path',
+                           'description': '',
+                           'required': True,
+                           'type': 'string'}])
+
+    def test_docstrings(self):
+        routes, docs = routes_to_swagger.load_routes(ROUTER, 'v1')
+        self.assertEqual(docs[CONTROLLER + ':show'], 'Show a server.')
+        swagger = routes_to_swagger.routes_to_swagger(routes, 'compute', 'v1',
+                                                      docs=docs)
+        index = swagger['paths']['/v1/servers'][0]
+        self.assertEqual(index['summary'], 'List servers.')
+
+    def test_docstrings_not_rendered(self):
+        routes_inspector.DOCSTRING_CACHE.clear()
+        routes, docs = routes_to_swagger.load_routes(ROUTER, 'v1')
+        self.assertEqual(routes_inspector.DOCSTRING_CACHE, {})
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def test_swagger(self):
+        routes_to_swagger.main1(ROUTER, 'compute', 'v1', self.output_dir)
+        filepath = os.path.join(self.output_dir, 'compute-v1-swagger.json')
+        with open(filepath) as swagger_file:
+            content = swagger_file.read()
+        swagger = json.loads(content)
+        self.assertEqual(swagger['info']['service'], 'compute')
+        # Written the same way as the other converters' output.
+        self.assertEqual(content, json.dumps(swagger, indent=2,
+                                             sort_keys=True,
+                                             separators=(',', ': ')))
+
+    def test_rst(self):
+        routes_to_swagger.main1(ROUTER, 'compute', 'v1', self.output_dir,
+                                format='rst')
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output_dir, 'index.json')))
@@ -0,0 +1,89 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Console script modules, and the cumulative import time in
+# microseconds each one is allowed.  They take about 20ms, build
+# imports the other converters.
+ENTRY_POINTS = {
+    'fairy_slipper.cmd.build': 45000,
+    'fairy_slipper.cmd.docbkx_to_json': 35000,
+    'fairy_slipper.cmd.swagger_to_rst': 35000,
+    'fairy_slipper.cmd.routes_to_swagger': 35000,
+    'fairy_slipper.cmd.tempest_log': 35000,
+    'fairy_slipper.cmd.wadl_to_swagger': 35000,
+}
+
+# Imports are timed this many times, the fastest run counts.
+RUNS = 3
+
+# Modules that are only needed once a conversion actually runs.
+DEFERRED_MODULES = ('docutils', 'jinja2', 'multiprocessing', 'pbr',
+                    'prettytable', 'urllib.request')
+
+
+def import_times(module, env=None):
+    """Return a map of module name to cumulative import time."""
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, env=env)
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            # The header line.
+            continue
+        times[fields[2].strip()] = cumulative
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime needs 3.7")
+class TestStartup(unittest.TestCase):
+
+    def test_deferred_imports(self):
+        for module in ENTRY_POINTS:
+            times = import_times(module)
+            for name in DEFERRED_MODULES:
+                self.assertNotIn(name, times,
+                                 "%s imports %s" % (module, name))
+
+    def test_import_budget(self):
+        # Time the imports the way an installed package runs, from
+        # bytecode compiled by the first run.
+        pycache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pycache)
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        for module, budget in ENTRY_POINTS.items():
+            import_times(module, env)
+            elapsed = min(import_times(module, env)[module]
+                          for run in range(RUNS))
+            self.assertLess(elapsed, budget,
+                            "%s took %sus to import" % (module, elapsed))
@@ -0,0 +1,98 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from fairy_slipper.cmd import batch
+from fairy_slipper.cmd import timings
+from fairy_slipper.cmd.timings import timer
+
+
+def convert(filename):
+    with timer.phase('parse'):
+        with timer.phase('sample'):
+            pass
+        with timer.phase('sample'):
+            pass
+    with timer.phase('write'):
+        pass
+
+
+class TestTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.timings_file = os.path.join(self.dir, 'timings.json')
+
+    def report(self):
+        with open(self.timings_file) as f:
+            return json.load(f)
+
+    def test_disabled(self):
+        files = list(timer.files)
+        with timer.file('a.xml') as record:
+            convert('a.xml')
+        self.assertIsNone(record)
+        self.assertEqual(timer.files, files)
+
+    def test_phases(self):
+        with timings.collect(self.timings_file):
+            with timer.file('a.xml'):
+                convert('a.xml')
+            with timer.phase('index'):
+                pass
+        self.assertFalse(timer.enabled)
+
+        report = self.report()
+        self.assertEqual(sorted(report['phases']), ['index'])
+        [record] = report['files']
+        self.assertEqual(record['filename'], 'a.xml')
+        self.assertEqual(
+            dict((name, phase['calls'])
+                 for name, phase in record['phases'].items()),
+            {'parse': 1, 'parse/sample': 2, 'write': 1})
+        for phase in [report, record] + list(record['phases'].values()):
+            self.assertGreaterEqual(phase['wall'], 0)
+            self.assertGreaterEqual(phase['cpu'], 0)
+            self.assertIn('peak_rss_kb', phase)
+
+    def test_batch(self):
+        for jobs in (1, 2):
+            with timings.collect(self.timings_file):
+                batch.run(convert, ['a.xml', 'b.xml'], jobs=jobs)
+            self.assertEqual(
+                [(record['filename'], sorted(record['phases']))
+                 for record in self.report()['files']],
+                [('a.xml', ['parse', 'parse/sample', 'write']),
+                 ('b.xml', ['parse', 'parse/sample', 'write'])])
+
+    def test_profile(self):
+        profile_file = os.path.join(self.dir, 'profile')
+        with timings.collect(profile_file=profile_file):
+            convert('a.xml')
+        self.assertFalse(os.path.exists(self.timings_file))
+        stats = pstats.Stats(profile_file)
+        self.assertTrue(any(function[2] == 'convert'
+                            for function in stats.stats))
@@ -17,13 +17,19 @@
 
 from __future__ import unicode_literals
 
+from copy import deepcopy
+import json
+import os
+import shutil
 try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO
+import tempfile
 import unittest
 import xml.sax
 
+from fairy_slipper.cmd import swagger_to_rst
 from fairy_slipper.cmd import wadl_to_swagger
 
 
@@ -513,3 +519,296 @@ class TestWADLHandler(unittest.TestCase):
                 'required': True,
                 'type': 'string'}},
               'type': 'object'}})
+
+
+SHARED_WADL = """<?xml version="1.0" encoding="UTF-8"?>
+<application xmlns="http://wadl.dev.java.net/2009/02"
+             xmlns:xsdxt="http://docs.rackspacecloud.com/xsd-ext/v1.0">
+  <resources>
+    <resource id="things" path="v2/things">
+      <method href="#listThings" />
+      <resource id="thing" path="{thing_id}">
+        <method href="#showThing" />
+      </resource>
+    </resource>
+  </resources>
+  <method name="GET" id="listThings">
+    <response status="200">
+      <representation mediaType="application/json">
+        <doc><xsdxt:code href="things.json" /></doc>
+      </representation>
+    </response>
+  </method>
+  <method name="GET" id="showThing">
+    <response status="200" />
+  </method>
+</application>
+"""
+
+
+class TestWADLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.filename = os.path.join(self.dir, 'shared.wadl')
+        with open(self.filename, 'w') as wadl_file:
+            wadl_file.write(SHARED_WADL)
+        self.sample = os.path.join(self.dir, 'things.json')
+        self.write_sample({'things': []})
+
+    def write_sample(self, sample):
+        with open(self.sample, 'w') as sample_file:
+            json.dump(sample, sample_file)
+
+    def api_ref(self, method_tags={}, resource_tags={}):
+        return {
+            'file_tags': {},
+            'method_tags': {self.filename + '#' + id: tag
+                            for id, tag in method_tags.items()},
+            'resource_tags': {self.filename + '#' + id: tag
+                              for id, tag in resource_tags.items()},
+            'tags': [{'name': tag} for tag in resource_tags.values()],
+        }
+
+    def test_books(self):
+        cache = wadl_to_swagger.WADLCache()
+        wadl = cache.parse(self.filename)
+        self.assertIs(cache.parse(self.filename), wadl)
+
+        apis, schemas = wadl.operations(
+            self.api_ref(method_tags={'listThings': 'list'}))
+        self.assertEqual(
+            [(url, [op['tags'] for op in ops]) for url, ops in apis.items()],
+            [('v2/things', [['list']]), ('v2/things/{thing_id}', [])])
+
+        apis, schemas = wadl.operations(
+            self.api_ref(resource_tags={'things': 'things'}))
+        self.assertEqual(
+            [(url, [op['tags'] for op in ops]) for url, ops in apis.items()],
+            [('v2/things', [['things']]),
+             ('v2/things/{thing_id}', [['things']])])
+
+        # Each book gets its own copy of the operations.
+        operation = apis['v2/things'][0]
+        operation['responses']['200']['examples'] = {}
+        self.assertEqual(
+            wadl.methods[0][1]['responses']['200']['examples'],
+            {'application/json': {'things': []}})
+
+    def test_cache_dir(self):
+        cache_dir = os.path.join(self.dir, 'cache')
+        api_ref = self.api_ref(resource_tags={'things': 'things'})
+        wadl = wadl_to_swagger.WADLCache(cache_dir).parse(self.filename)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        cached = wadl_to_swagger.WADLCache(cache_dir).load(
+            os.listdir(cache_dir)[0][:-len('.json')])
+        self.assertEqual(cached.operations(api_ref),
+                         wadl.operations(api_ref))
+
+        # A changed sample invalidates the entry.
+        self.write_sample({'things': [1]})
+        self.assertIsNone(wadl_to_swagger.WADLCache(cache_dir).load(
+            os.listdir(cache_dir)[0][:-len('.json')]))
+        # Samples are only read once per run.
+        wadl_to_swagger.loaded_samples.samples.clear()
+        wadl = wadl_to_swagger.WADLCache(cache_dir).parse(self.filename)
+        self.assertEqual(
+            wadl.methods[0][1]['responses']['200']['examples'],
+            {'application/json': {'things': [1]}})
+
+    def test_parse_all(self):
+        filenames = [self.filename, os.path.join(self.dir, 'other.wadl')]
+        with open(filenames[1], 'w') as wadl_file:
+            wadl_file.write(SHARED_WADL.replace('v2/', 'v3/'))
+        api_ref = self.api_ref(resource_tags={'things': 'things'})
+
+        serial = wadl_to_swagger.WADLCache().parse_all(filenames)
+        parallel = wadl_to_swagger.WADLCache().parse_all(filenames, jobs=2)
+        self.assertEqual([wadl.filename for wadl in parallel], filenames)
+        self.assertEqual([wadl.operations(api_ref) for wadl in parallel],
+                         [wadl.operations(api_ref) for wadl in serial])
+
+    def test_parse_all_counts(self):
+        filenames = [self.filename, os.path.join(self.dir, 'other.wadl')]
+        with open(filenames[1], 'w') as wadl_file:
+            wadl_file.write(SHARED_WADL.replace('v2/', 'v3/'))
+        samples = wadl_to_swagger.loaded_samples
+        samples.samples.clear()
+        reads, hits = samples.counts()
+        wadl_to_swagger.WADLCache().parse_all(filenames)
+        self.assertEqual(samples.counts(), (reads + 1, hits + 1))
+
+        # The samples loaded by pool workers are counted too.
+        samples.samples.clear()
+        reads, hits = samples.counts()
+        wadl_to_swagger.WADLCache().parse_all(filenames, jobs=2)
+        self.assertEqual(sum(samples.counts()) - reads - hits, 2)
+
+    def test_samples(self):
+        samples = wadl_to_swagger.SampleCache()
+        content_hash, sample = samples.load(self.sample, 'application/json')
+        self.assertEqual(sample, {'things': []})
+        self.assertIs(samples.load(self.sample, 'application/json')[1],
+                      sample)
+        self.assertEqual(samples.hits, 1)
+        self.assertEqual(
+            samples.load(os.path.join(self.dir, 'missing.json'),
+                         'application/json'),
+            (None, None))
+
+    def test_samples_unchanged(self):
+        sample = {'things': [{'id': 1, 'name': 'a'}], 'links': []}
+        self.write_sample(sample)
+        wadl_to_swagger.loaded_samples.forget([self.sample])
+        api_ref = self.api_ref(resource_tags={'things': 'things'})
+        api_ref.update({'title': 'Things', 'service': 'things',
+                        'version': 'v2'})
+
+        # Convert the way build does, with and without an example
+        # store, the second conversion reuses the sample.
+        for store_dir in (None, os.path.join(self.dir, 'store')):
+            output_dir = tempfile.mkdtemp(dir=self.dir)
+            swagger, inputs = wadl_to_swagger.api_ref_to_swagger(
+                api_ref, store_dir=store_dir, output_dir=output_dir)
+            swagger_to_rst.write_examples(swagger, output_dir, output_dir)
+            # No stage of the conversion modified the shared sample.
+            content_hash, loaded = wadl_to_swagger.loaded_samples.load(
+                self.sample, 'application/json')
+            self.assertEqual(loaded, sample)
+            if store_dir is None:
+                response = swagger['paths']['v2/things'][0][
+                    'responses']['200']
+                self.assertIs(response['examples']['application/json'],
+                              loaded)
+
+    def test_main1_inputs(self):
+        api_ref = self.api_ref(resource_tags={'things': 'things'})
+        api_ref.update({'title': 'Things', 'service': 'things',
+                        'version': 'v2'})
+        source_file = os.path.join(self.dir, 'api-ref-things-v2.json')
+        with open(source_file, 'w') as api_ref_file:
+            json.dump(api_ref, api_ref_file)
+
+        inputs, outputs, counts = wadl_to_swagger.main1(source_file, self.dir)
+        self.assertEqual(
+            inputs, [source_file, os.path.join(self.dir,
+                                               'things-examples.json'),
+                     self.filename, self.sample])
+        self.assertEqual(outputs,
+                         [os.path.join(self.dir, 'things-v2-swagger.json')])
+        self.assertEqual(counts, (1, 0))
+
+
+class TestPathMatcher(unittest.TestCase):
+
+    def test_match(self):
+        matcher = wadl_to_swagger.PathMatcher([
+            'v2/{tenant_id}/servers/{server_id}',
+            'v2/{tenant_id}/servers/detail',
+            'v2/{tenant_id}/servers',
+            'v2/{tenant_id}/images/{image_id}.json',
+        ])
+        self.assertEqual(matcher.match('v2/abc/servers'),
+                         ['v2/{tenant_id}/servers'])
+        self.assertEqual(matcher.match('v2/abc/servers/detail'),
+                         ['v2/{tenant_id}/servers/{server_id}',
+                          'v2/{tenant_id}/servers/detail'])
+        self.assertEqual(matcher.match('v2/abc/images/def.json'),
+                         ['v2/{tenant_id}/images/{image_id}.json'])
+        self.assertEqual(matcher.match('v2/abc/images/def'), [])
+        self.assertEqual(matcher.match('v2/abc/servers/a/b'), [])
+        self.assertEqual(matcher.match('v2//servers'), [])
+
+
+class TestDedupeSchemas(unittest.TestCase):
+
+    def swagger(self):
+        thing = {'type': 'object',
+                 'properties': {'name': {'type': 'string',
+                                         'description': 'The name.'}}}
+        body = {'type': 'object',
+                'properties': {'id': {'type': 'string'}}}
+
+        def operation(id):
+            schema = {'$ref': '#/definitions/' + id}
+            return {'id': id,
+                    'parameters': [{'in': 'body', 'name': 'body',
+                                    'schema': schema}],
+                    'responses': {'200': {}}}
+
+        return {
+            'definitions': {'updateThing': deepcopy(thing),
+                            'createThing': deepcopy(thing),
+                            'createThing_200': deepcopy(body),
+                            'renameThing': deepcopy(body)},
+            'paths': {'v2/things': [operation('createThing')],
+                      'v2/things/{id}': [operation('updateThing'),
+                                         operation('renameThing')]},
+        }
+
+    def refs(self, swagger):
+        return [operation['parameters'][0]['schema']['$ref']
+                for url in sorted(swagger['paths'])
+                for operation in swagger['paths'][url]]
+
+    def test_merge(self):
+        swagger = self.swagger()
+        renamed = wadl_to_swagger.dedupe_schemas(swagger)
+        self.assertEqual(renamed, {'updateThing': 'createThing',
+                                   'renameThing': 'createThing_200'})
+        self.assertEqual(sorted(swagger['definitions']),
+                         ['createThing', 'createThing_200'])
+        self.assertEqual(self.refs(swagger),
+                         ['#/definitions/createThing',
+                          '#/definitions/createThing',
+                          '#/definitions/createThing_200'])
+
+    def test_aliases(self):
+        swagger = self.swagger()
+        wadl_to_swagger.dedupe_schemas(swagger, aliases=True)
+        self.assertEqual(swagger['definitions']['updateThing'],
+                         {'$ref': '#/definitions/createThing'})
+        self.assertEqual(len(swagger['definitions']), 4)
+        self.assertEqual(self.refs(swagger)[1], '#/definitions/createThing')
+
+    def test_response_schemas(self):
+        swagger = self.swagger()
+        swagger['definitions']['updateThing_200'] = deepcopy(
+            swagger['definitions']['createThing_200'])
+        responses = deepcopy(swagger['paths']['v2/things/{id}'][0][
+            'responses'])
+        renamed = wadl_to_swagger.dedupe_schemas(swagger)
+        self.assertEqual(renamed['updateThing_200'], 'createThing_200')
+        # Response schemas are only found by name, so they're kept as
+        # an alias even without aliases.
+        self.assertEqual(swagger['definitions']['updateThing_200'],
+                         {'$ref': '#/definitions/createThing_200'})
+        self.assertNotIn('renameThing', swagger['definitions'])
+        self.assertEqual(swagger['paths']['v2/things/{id}'][0]['responses'],
+                         responses)
+
+        # Only the canonical schema is written in full.
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        swagger['info'] = {'service': 'things', 'version': 'v2'}
+        swagger_to_rst.write_jsonschema(swagger, output_dir)
+        schemas = {}
+        for name in ('createThing_200', 'updateThing_200'):
+            with open(os.path.join(output_dir, 'things', 'v2',
+                                   name + '.json')) as f:
+                schemas[name] = json.load(f)
+        self.assertEqual(schemas,
+                         {'createThing_200': {
+                             'type': 'object',
+                             'properties': {'id': {'type': 'string'}}},
+                          'updateThing_200': {
+                              '$ref': 'createThing_200.json'}})
+
+    def test_distinct(self):
+        swagger = self.swagger()
+        swagger['definitions']['updateThing']['properties']['name'][
+            'description'] = 'The new name.'
+        wadl_to_swagger.dedupe_schemas(swagger)
+        self.assertIn('updateThing', swagger['definitions'])
@@ -0,0 +1,135 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import io
+import os
+import unittest
+import xml.sax
+
+from fairy_slipper.cmd import xmlparse
+
+FIXTURES = os.path.dirname(__file__)
+
+DOCUMENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- A comment -->
+<application xmlns="http://wadl.dev.java.net/2009/02"
+             xmlns:wadl="http://wadl.dev.java.net/2009/02"
+             xmlns:xlink="http://www.w3.org/1999/xlink">
+  <resources xml:id="things">
+    <resource id="thing" path="v2/{thing_id}" />
+  </resources>
+  <method name="GET" id="showThing">
+    <wadl:doc title="Show">
+      <para>Shows a <link xlink:href="http://example.com">thing</link>.
+      </para><?pi data?>
+      <programlisting>GET /v2/things
+Accept: application/json</programlisting>
+    </wadl:doc>
+    <doc />
+  </method>
+</application>
+"""
+
+ENTITIES = b"""<para>Some &amp; text<![CDATA[ data]]></para>"""
+
+
+class RecordingHandler(xml.sax.ContentHandler):
+
+    def startDocument(self):
+        self.events = [('startDocument',)]
+
+    def endDocument(self):
+        self.events.append(('endDocument',))
+
+    def startElement(self, name, attrs):
+        self.events.append(('startElement', name, dict(attrs)))
+
+    def endElement(self, name):
+        self.events.append(('endElement', name))
+
+    def characters(self, content):
+        self.events.append(('characters', content))
+
+
+def parse(source, backend):
+    """Parse a filename or a document's bytes, returning the events."""
+    if isinstance(source, bytes) and source.startswith(b'<'):
+        source = io.BytesIO(source)
+    handler = RecordingHandler()
+    xmlparse.parse(source, handler, backend=backend)
+    return handler.events
+
+
+class TestXMLParse(unittest.TestCase):
+
+    sources = [os.path.join(FIXTURES, filename)
+               for filename in sorted(os.listdir(FIXTURES))
+               if filename.endswith('.xml')]
+
+    def check_backend(self, backend, sources):
+        for source in sources:
+            self.assertEqual(parse(source, backend), parse(source, 'sax'))
+
+    def test_expat(self):
+        self.check_backend('expat', self.sources + [DOCUMENT, ENTITIES])
+
+    @unittest.skipUnless(xmlparse.have_lxml(), "lxml isn't installed")
+    def test_lxml(self):
+        self.check_backend('lxml', self.sources + [DOCUMENT])
+
+    def test_names(self):
+        events = parse(DOCUMENT, 'expat')
+        self.assertIn(('startElement', 'resources',
+                       {'xml:id': 'things'}), events)
+        self.assertIn(('startElement', 'wadl:doc', {'title': 'Show'}),
+                      events)
+        self.assertIn(('startElement', 'link',
+                       {'xlink:href': 'http://example.com'}), events)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, xmlparse.get_backend, 'dom')
+
+
+class TestElementStack(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = xmlparse.ElementStack()
+        self.stack.reset_stack()
+        for depth, name in enumerate(['list', 'item', 'list', 'item']):
+            self.stack.push_element(name, {'depth': depth})
+
+    def test_search_stack_for(self):
+        self.assertEqual(self.stack.search_stack_for('list'), {'depth': 2})
+        self.assertIsNone(self.stack.search_stack_for('para'))
+        self.stack.pop_element()
+        self.stack.pop_element()
+        self.assertEqual(self.stack.search_stack_for('list'), {'depth': 0})
+
+    def test_count_open(self):
+        self.assertEqual(self.stack.count_open('item'), 2)
+        self.assertEqual(self.stack.pop_element(), 'item')
+        self.assertEqual(self.stack.count_open('item'), 1)
+        self.assertEqual(self.stack.count_open('para'), 0)
+
+    def test_on_top_tag_stack(self):
+        self.assertTrue(self.stack.on_top_tag_stack('item'))
+        self.assertTrue(self.stack.on_top_tag_stack('list', 'item'))
+        self.assertFalse(self.stack.on_top_tag_stack('item', 'item'))
+        self.assertFalse(self.stack.on_top_tag_stack(
+            'list', 'item', 'list', 'item', 'list'))
@@ -0,0 +1,134 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A small benchmark harness for the conversion and rendering code.
+
+Each benchmark module defines ``BENCHMARKS``, a mapping of names to
+zero argument callables, and hands it to :func:`main`.  Wall time is
+the best of several runs, peak memory is measured separately with
+:mod:`tracemalloc` where it's available.  Results can be saved as a
+baseline and later runs compared against it, failing when any metric
+regresses by more than the threshold.
+"""
+
+from __future__ import print_function
+
+import gc
+import json
+import sys
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+DEFAULT_THRESHOLD = 0.25
+
+METRICS = ('time', 'peak_memory')
+
+
+def measure(func, repeat=5):
+    """Return the best wall time and the peak memory of ``func``."""
+    timings = []
+    for i in range(repeat):
+        gc.collect()
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+
+    peak_memory = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'time': min(timings),
+            'peak_memory': peak_memory}
+
+
+def run(benchmarks, repeat=5, names=None):
+    results = {}
+    for name in sorted(benchmarks):
+        if names and not any(n in name for n in names):
+            continue
+        results[name] = measure(benchmarks[name], repeat=repeat)
+        print('%-40s %10.4fs %12s' % (name,
+                                      results[name]['time'],
+                                      results[name]['peak_memory']))
+    return results
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """Return a list of ``(name, metric, old, new)`` regressions."""
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        for metric in METRICS:
+            old = baseline[name].get(metric)
+            new = results[name].get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main(benchmarks, argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-r', '--repeat', action='store', type=int, default=5,
+        help="How many times to time each benchmark.")
+    parser.add_argument(
+        '--save', action='store',
+        help="Write the results to this file.")
+    parser.add_argument(
+        '--compare', action='store',
+        help="Fail if the results regress against this baseline file.")
+    parser.add_argument(
+        '--threshold', action='store', type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Fraction a metric may grow by before it's a regression.")
+    parser.add_argument(
+        'names', nargs='*',
+        help="Only run benchmarks containing these names.")
+
+    args = parser.parse_args(argv)
+
+    results = run(benchmarks, repeat=args.repeat, names=args.names)
+
+    if args.save:
+        with open(args.save, 'w') as out_file:
+            json.dump(results, out_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as in_file:
+            baseline = json.load(in_file)
+        regressions = compare(baseline, results, args.threshold)
+        for name, metric, old, new in regressions:
+            print('REGRESSION %s %s: %s -> %s' % (name, metric, old, new),
+                  file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,34 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Run all of the benchmarks.
+
+Run with ``python -m fairy_slipper.tests.perf``, see
+:mod:`fairy_slipper.tests.perf` for the options.
+"""
+
+import sys
+
+from fairy_slipper.tests import perf
+from fairy_slipper.tests.perf import bench_rest
+from fairy_slipper.tests.perf import bench_wadl
+
+BENCHMARKS = {}
+BENCHMARKS.update(bench_rest.BENCHMARKS)
+BENCHMARKS.update(bench_wadl.BENCHMARKS)
+
+sys.exit(perf.main(BENCHMARKS))
@@ -0,0 +1,105 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for :func:`fairy_slipper.rest.publish_string`.
+
+Run with ``python -m fairy_slipper.tests.perf.bench_rest``, see
+:mod:`fairy_slipper.tests.perf` for the options.
+"""
+
+from __future__ import unicode_literals
+
+import functools
+import sys
+
+from fairy_slipper import rest
+from fairy_slipper.tests import perf
+
+
+def synthetic_rst(operations=10, parameters=3, table_rows=0,
+                  bullets=0, literal_blocks=0, tags=0):
+    """Return a ReST API document with the given feature mix."""
+    lines = []
+    for op in range(operations):
+        lines.append('.. http:get:: /v2/{tenant_id}/things%d/{id}' % op)
+        lines.append('   :title: Show thing %d' % op)
+        lines.append('   :synopsis: Shows details for thing %d.' % op)
+        lines.append('')
+        lines.append('   Shows **details** for a ``thing``, see '
+                     '`the docs <http://example.com/%d>`_.' % op)
+        lines.append('')
+        if table_rows:
+            lines.append('   +----------+--------------------+')
+            lines.append('   | Name     | Description        |')
+            lines.append('   +==========+====================+')
+            for row in range(table_rows):
+                lines.append('   | name%-4d | **bold** desc %-4d |'
+                             % (row, row))
+                lines.append('   +----------+--------------------+')
+            lines.append('')
+        for item in range(bullets):
+            lines.append('   - item %d' % item)
+            lines.append('')
+            lines.append('     - nested item %d' % item)
+            lines.append('')
+        for block in range(literal_blocks):
+            lines.append('   An example::')
+            lines.append('')
+            lines.append('      {"thing": {"id": %d,' % block)
+            lines.append('                 "name": "example"}}')
+            lines.append('')
+        lines.append('   :requestexample: v2/examples/thing%d_req.json' % op)
+        lines.append('   :responseexample 200: '
+                     'v2/examples/thing%d_resp_200.json' % op)
+        lines.append('   :accepts: application/json')
+        lines.append('   :produces: application/json')
+        lines.append('   :tag: tag%d' % (op % max(tags, 1)))
+        lines.append('   :parameter tenant_id: The tenant ID.')
+        lines.append('   :parameter id: The thing ID.')
+        for param in range(parameters):
+            lines.append('   :query param%d: Query parameter %d.'
+                         % (param, param))
+        lines.append('   :statuscode 200:')
+        lines.append('   :statuscode 404:')
+        lines.append('')
+        lines.append('')
+    for tag in range(tags):
+        lines.append('.. swagger:tag:: tag%d' % tag)
+        lines.append('   :synopsis: Things in group %d.' % tag)
+        lines.append('')
+        lines.append('   Lorem ipsum dolor sit amet.')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+DOCUMENTS = {
+    'small': synthetic_rst(operations=5),
+    'operations': synthetic_rst(operations=200),
+    'parameters': synthetic_rst(operations=20, parameters=50),
+    'tables': synthetic_rst(operations=20, table_rows=50),
+    'bullets': synthetic_rst(operations=20, bullets=30),
+    'literal_blocks': synthetic_rst(operations=20, literal_blocks=30),
+    'tags': synthetic_rst(operations=100, tags=100),
+}
+
+BENCHMARKS = dict(('publish_string.%s' % name,
+                   functools.partial(rest.publish_string, rst))
+                  for name, rst in DOCUMENTS.items())
+
+
+if __name__ == '__main__':
+    sys.exit(perf.main(BENCHMARKS))
@@ -0,0 +1,144 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for :mod:`fairy_slipper.cmd.wadl_to_swagger`.
+
+Run with ``python -m fairy_slipper.tests.perf.bench_wadl``, see
+:mod:`fairy_slipper.tests.perf` for the options.
+"""
+
+from __future__ import unicode_literals
+
+import functools
+import sys
+
+import io
+
+from fairy_slipper.cmd import wadl_to_swagger
+from fairy_slipper.cmd import xmlparse
+from fairy_slipper.tests import perf
+
+METHOD = '''  <method name="POST" id="createThing%(n)d">
+    <wadl:doc title="Create thing %(n)d">
+      <para role="shortdesc">Creates a thing and attaches
+        it to a server instance.</para>
+      <para>Set the <code>thing</code> key, see
+        <link xlink:href="http://example.com">things</link>.</para>
+    </wadl:doc>
+    <request>
+      <representation mediaType="application/json">
+        <param name="name" style="plain" type="xsd:string" required="true">
+          <wadl:doc><para>The name of the thing.</para></wadl:doc>
+        </param>
+        <param name="size" style="plain" type="xsd:int" required="false">
+          <wadl:doc><para>The size of the thing.</para></wadl:doc>
+        </param>
+      </representation>
+    </request>
+    <response status="202">
+      <representation mediaType="application/json">
+        <param name="id" style="plain" type="xsd:string">
+          <wadl:doc><para>The ID of the new thing.</para></wadl:doc>
+        </param>
+      </representation>
+    </response>
+  </method>
+'''
+
+
+def synthetic_paths(resources=100):
+    """Return the URL templates of a compute like API."""
+    paths = []
+    for resource in range(resources):
+        base = 'v2/{tenant_id}/things%d' % resource
+        paths.extend([base,
+                      base + '/detail',
+                      base + '/{thing_id}',
+                      base + '/{thing_id}/action',
+                      base + '/{thing_id}/metadata/{key}'])
+    return paths
+
+
+def synthetic_urls(resources=100, calls=10000):
+    """Return concrete URLs spread over :func:`synthetic_paths`."""
+    urls = []
+    for call in range(calls):
+        base = 'v2/tenant/things%d' % (call % resources)
+        urls.append([base,
+                     base + '/detail',
+                     base + '/%d' % call,
+                     base + '/%d/action' % call,
+                     base + '/%d/metadata/key' % call,
+                     base + '/%d/unknown' % call][call % 6])
+    return urls
+
+
+def synthetic_wadl(methods=500, depth=0):
+    """Return the bytes of a WADL file with this many methods.
+
+    Each method's resource is nested ``depth`` resources deep.
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<application xmlns="http://wadl.dev.java.net/2009/02"',
+             '    xmlns:wadl="http://wadl.dev.java.net/2009/02"',
+             '    xmlns:xlink="http://www.w3.org/1999/xlink">',
+             '  <resources>']
+    for n in range(methods):
+        for level in range(depth):
+            lines.append('<resource id="level%d_%d" path="l%d">'
+                         % (n, level, level))
+        lines.append('    <resource id="things%d" path="v2/things%d">'
+                     % (n, n))
+        lines.append('      <method href="#createThing%d" />' % n)
+        lines.append('    </resource>')
+        lines.extend(['</resource>'] * depth)
+    lines.append('  </resources>')
+    for n in range(methods):
+        lines.append(METHOD % {'n': n})
+    lines.append('</application>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def parse_wadl(content, backend):
+    handler = wadl_to_swagger.WADLHandler('synthetic.wadl')
+    xmlparse.parse(io.BytesIO(content), handler, backend=backend)
+
+
+def match_examples(paths, urls):
+    matcher = wadl_to_swagger.PathMatcher(paths)
+    for url in urls:
+        matcher.match(url)
+
+
+WADL = synthetic_wadl()
+
+BENCHMARKS = {
+    'match_examples': functools.partial(
+        match_examples, synthetic_paths(), synthetic_urls()),
+}
+
+BENCHMARKS['parse_wadl_nested'] = functools.partial(
+    parse_wadl, synthetic_wadl(depth=50), 'expat')
+
+for backend in xmlparse.BACKENDS:
+    if backend != 'lxml' or xmlparse.have_lxml():
+        BENCHMARKS['parse_wadl.%s' % backend] = functools.partial(
+            parse_wadl, WADL, backend)
+
+
+if __name__ == '__main__':
+    sys.exit(perf.main(BENCHMARKS))
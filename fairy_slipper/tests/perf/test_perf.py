@@ -0,0 +1,53 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+from fairy_slipper import rest
+from fairy_slipper.tests import perf
+from fairy_slipper.tests.perf import bench_rest
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_regression(self):
+        baseline = {'a': {'time': 1.0, 'peak_memory': 100}}
+        results = {'a': {'time': 1.5, 'peak_memory': 100}}
+        assert perf.compare(baseline, results, threshold=0.25) == \
+            [('a', 'time', 1.0, 1.5)]
+
+    def test_within_threshold(self):
+        baseline = {'a': {'time': 1.0, 'peak_memory': 100}}
+        results = {'a': {'time': 1.2, 'peak_memory': 120},
+                   'b': {'time': 9.0, 'peak_memory': 900}}
+        assert perf.compare(baseline, results, threshold=0.25) == []
+
+
+class TestSyntheticRST(unittest.TestCase):
+
+    def test_feature_mix(self):
+        rst = bench_rest.synthetic_rst(operations=3, parameters=2,
+                                       table_rows=2, bullets=2,
+                                       literal_blocks=1, tags=2)
+        json = rest.publish_string(rst)
+        assert len(json['paths']) == 3
+        assert len(json['tags']) == 2
+        operation = json['paths']['/v2/{tenant_id}/things0/{id}'][0]
+        assert len(operation['parameters']) == 4
+        assert sorted(operation['responses']) == ['200', '404']
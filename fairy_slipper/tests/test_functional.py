@@ -15,6 +15,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 
 from fairy_slipper.tests import FunctionalTest
 
@@ -86,3 +87,16 @@ class TestRootController(FunctionalTest):
                        'name': 'simple',
                        'summary': 'Simple Tag'}]}
         assert response.status_int == 200
+
+    def test_get_doc_example(self):
+        response = self.app.get('/doc/identity/v2/examples/simple_resp_200')
+        assert response.status_int == 200
+        assert json.loads(response.text) == {'simple': True}
+        # The ETag is the checksum from identity/v2.sha256.
+        assert response.etag == ('5888e0b9e87db587c9e73f8b84abb1d5'
+                                 'dd790979cf72af290eb27727575f804a')
+
+        response = self.app.get(
+            '/doc/identity/v2/examples/simple_resp_200',
+            headers={'If-None-Match': '"%s"' % response.etag})
+        assert response.status_int == 304
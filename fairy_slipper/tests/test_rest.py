@@ -17,6 +17,9 @@
 
 from __future__ import unicode_literals
 
+import os
+import shutil
+import tempfile
 import unittest
 
 import docutils.core
@@ -720,3 +723,206 @@ class TestReSTTag(unittest.TestCase):
                         'tags': [{'name': 'my-tag',
                                   'description': 'body\n\n',
                                   'summary': ''}]}
+
+
+class TestReSTIterOperations(unittest.TestCase):
+
+    def test_operations_and_tags(self):
+        rst = """
+.. http:get:: /path
+
+   :tag: my-tag
+
+.. http:post:: /path
+
+   body
+
+.. swagger:tag:: my-tag
+   :synopsis: Interesting things!
+"""
+        events = list(rest.iter_operations(rst))
+        assert events == [
+            ('path', '/path', minimal_method_json(tags=['my-tag'])),
+            ('path', '/path', minimal_method_json(method='post',
+                                                  description='body\n\n')),
+            ('tag', 'my-tag', {'name': 'my-tag',
+                               'description': '',
+                               'summary': 'Interesting things!'})]
+
+    def test_matches_publish_string(self):
+        rst = """
+.. http:get:: /path
+
+   :statuscode 200: Success! Yeah!
+
+.. http:get:: /other
+
+   :parameter thing: A parameter something.
+"""
+        json = rest.publish_string(rst)
+        paths = {}
+        for kind, url_path, operation in rest.iter_operations(rst):
+            paths.setdefault(url_path, []).append(operation)
+        assert paths == json['paths']
+
+    def test_references(self):
+        rst = """
+.. http:get:: /path
+
+   See the docs_ for |thing|.
+
+.. |thing| replace:: things
+
+.. http:get:: /other
+
+   Back to the docs_.
+
+.. _docs: http://example.com/
+"""
+        json = rest.publish_string(rst)
+        paths = {}
+        for kind, url_path, operation in rest.iter_operations(rst):
+            paths.setdefault(url_path, []).append(operation)
+        assert paths == json['paths']
+        assert paths['/path'][0]['description'] == \
+            'See the [docs](http://example.com/) for things.\n\n'
+
+    def test_split_directives(self):
+        rst = """Intro.
+
+.. http:get:: /path
+
+   body
+
+.. _docs: http://example.com/
+
+Between.
+
+.. swagger:tag:: my-tag
+"""
+        parts, definitions = rest.split_directives(rst)
+        assert parts == ['Intro.\n\n',
+                         '.. http:get:: /path\n\n   body\n\n',
+                         'Between.\n\n',
+                         '.. swagger:tag:: my-tag\n']
+        assert definitions == '.. _docs: http://example.com/\n\n'
+
+
+class TestReSTCompact(unittest.TestCase):
+
+    rst = """
+.. http:get:: /path
+
+   :parameter thing: A parameter something.
+   :query limit: Page size.
+   :statuscode 200:
+   :tag: my-tag
+
+.. http:get:: /other
+
+   :statuscode 200:
+   :tag: my-tag
+
+.. swagger:tag:: my-tag
+   :synopsis: Interesting things!
+"""
+
+    def test_round_trip(self):
+        json = rest.publish_string(self.rst)
+        compact = rest.publish_string(self.rst, compact=True)
+        assert rest.to_json(compact) == json
+
+    def test_shared_values(self):
+        compact = rest.publish_string(self.rst, compact=True)
+        first = compact['paths']['/path'][0]
+        second = compact['paths']['/other'][0]
+        assert first.tags[0] is second.tags[0]
+        assert (first.responses['200'].description is
+                second.responses['200'].description)
+        assert first.produces is rest.EMPTY_LIST
+        assert second.parameters is rest.EMPTY_LIST
+        assert not hasattr(first, '__dict__')
+
+    def test_shared_per_document(self):
+        def document(tag, description):
+            return {'paths': {'/path': [{'tags': [tag],
+                                         'description': description}],
+                              '/other': [{'tags': [''.join(tag)],
+                                          'description': ''.join(
+                                              description)}]},
+                    'tags': []}
+
+        compact = rest.compact_output(document('my-tag', 'Things.'))
+        first = compact['paths']['/path'][0]
+        second = compact['paths']['/other'][0]
+        assert first.tags[0] is second.tags[0]
+        assert first.description is not second.description
+
+        # Nothing is kept between documents.
+        other = rest.compact_output(document(''.join('my-tag'), 'Things.'))
+        assert other['paths']['/path'][0].tags[0] is not first.tags[0]
+
+
+class TestReSTRenderCache(unittest.TestCase):
+
+    rst = """
+.. http:get:: /path
+
+   :statuscode 200:
+"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_cached_output(self):
+        cache = rest.RenderCache(self.directory)
+        json = rest.publish_string(self.rst, cache=cache)
+        key = cache.key(self.rst)
+        assert cache.get(key) == json
+
+        # A hit must not need docutils at all.
+        cache.set(key, {'paths': {}, 'tags': ['cached']})
+        assert rest.publish_string(self.rst, cache=cache) == \
+            {'paths': {}, 'tags': ['cached']}
+
+    def test_eviction(self):
+        cache = rest.RenderCache(self.directory, max_size=1)
+        cache.set(cache.key('a'), {'paths': {}, 'tags': []})
+        cache.set(cache.key('b'), {'paths': {}, 'tags': []})
+        assert cache.get(cache.key('a')) is None
+        entries = [f for dirpath, dirnames, filenames
+                   in os.walk(self.directory) for f in filenames]
+        assert entries == []
+
+    def test_eviction_scans(self):
+        cache = rest.RenderCache(self.directory)
+        scans = []
+        evict = cache.evict
+
+        def counting_evict():
+            scans.append(cache.size)
+            evict()
+        cache.evict = counting_evict
+        for name in 'abc':
+            cache.set(cache.key(name), {'paths': {}, 'tags': []})
+        # Only the first write needs the size of the store.
+        assert scans == [None]
+        assert cache.size == sum(
+            os.path.getsize(os.path.join(dirpath, f))
+            for dirpath, dirnames, filenames in os.walk(self.directory)
+            for f in filenames)
+
+        # Writes past the size scan the store again.
+        cache.max_size = cache.size
+        cache.set(cache.key('d'), {'paths': {}, 'tags': []})
+        assert len(scans) == 2
+        assert cache.size <= cache.max_size
+
+    def test_key_translator_version(self):
+        cache = rest.RenderCache(self.directory)
+        key = cache.key(self.rst)
+        assert rest.RenderCache(self.directory).key(self.rst) == key
+        # A changed translator gets its own entries.
+        cache.version = rest.CACHE_FORMAT + 'changed'
+        assert cache.key(self.rst) != key
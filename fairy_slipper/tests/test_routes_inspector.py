@@ -0,0 +1,150 @@
+# Copyright (c) 2015 Russell Sim <russell.sim@gmail.com>
+#
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import unicode_literals
+
+import unittest
+
+from fairy_slipper.controllers import routes_inspector
+
+ROUTER = 'fairy_slipper.tests.test_routes_inspector:Router'
+
+
+class ServersController(object):
+
+    def index(self, req):
+        """List servers."""
+
+    def show(self, req, id):
+        """Show a server."""
+
+    def delete(self, req, id):
+        pass
+
+
+class Resource(object):
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def __call__(self, environ, start_response):
+        pass
+
+
+class Router(object):
+
+    def __init__(self, mapper):
+        servers = Resource(ServersController())
+        mapper.connect('/servers', controller=servers,
+                       action='index', conditions={'method': ['GET']})
+        mapper.connect('/servers/{id}', controller=servers,
+                       action='show', conditions={'method': ['GET']})
+        mapper.connect('/servers/{id}', controller=servers,
+                       action='delete', conditions={'method': ['DELETE']})
+        mapper.connect('/servers/{id}.:(format)', controller=servers,
+                       action='show', conditions={'method': ['GET']})
+        self.map = mapper
+
+
+class TestDocSpecController(unittest.TestCase):
+
+    def test_routes(self):
+        controller = routes_inspector.DocSpecController('v1', ROUTER)
+        routes = controller.index()
+        self.assertEqual(
+            [(r['classpath'], r['routepath']) for r in routes],
+            [(__name__ + '.ServersController:delete', '/v1/servers/{id}'),
+             (__name__ + '.ServersController:index', '/v1/servers'),
+             (__name__ + '.ServersController:show', '/v1/servers/{id}')])
+        self.assertNotIn('whole', routes[0])
+        self.assertIn('whole', routes[1])
+        self.assertIs(controller.index(), routes)
+
+    def test_filters(self):
+        controller = routes_inspector.DocSpecController('v1', ROUTER)
+        classpath = __name__ + '.ServersController'
+        self.assertEqual(
+            [r['action'] for r in controller.index(method='get')],
+            ['index', 'show'])
+        self.assertEqual(
+            [r['action'] for r in controller.index(prefix='/v1/servers/')],
+            ['delete', 'show'])
+        self.assertEqual(
+            [r['action'] for r in controller.index(classpath=classpath)],
+            ['delete', 'index', 'show'])
+        self.assertEqual(
+            [r['action'] for r in controller.index(
+                classpath=classpath + ':show', method='GET',
+                prefix='/v1/servers')],
+            ['show'])
+        self.assertEqual(controller.index(method='PUT'), [])
+
+    def test_docstring_cache(self):
+        controller = ServersController()
+        first = routes_inspector.render_docstring(controller, 'index')
+        self.assertIs(
+            routes_inspector.render_docstring(controller, 'index'), first)
+
+        class Changed(ServersController):
+            def index(self, req):
+                """List all the servers."""
+        Changed.__name__ = 'ServersController'
+        Changed.__module__ = ServersController.__module__
+        changed = routes_inspector.render_docstring(Changed(), 'index')
+        self.assertIsNot(changed, first)
+        # The render of the old docstring is replaced.
+        key = (__name__, 'ServersController', 'index')
+        self.assertIs(routes_inspector.DOCSTRING_CACHE[key][1], changed)
+
+    def test_docstring_cache_size(self):
+        routes_inspector.DOCSTRING_CACHE.clear()
+        self.addCleanup(setattr, routes_inspector, 'DOCSTRING_CACHE_SIZE',
+                        routes_inspector.DOCSTRING_CACHE_SIZE)
+        routes_inspector.DOCSTRING_CACHE_SIZE = 2
+        controller = ServersController()
+        routes_inspector.render_docstring(controller, 'index')
+        routes_inspector.render_docstring(controller, 'show')
+        routes_inspector.render_docstring(controller, 'index')
+        Other = type(str('OtherController'), (ServersController,), {})
+        routes_inspector.render_docstring(Other(), 'index')
+        # The least recently used render was dropped.
+        self.assertEqual(list(routes_inspector.DOCSTRING_CACHE),
+                         [(__name__, 'ServersController', 'index'),
+                          (__name__, 'OtherController', 'index')])
+
+
+class TestVersionAPIController(unittest.TestCase):
+
+    def test_controllers_reused(self):
+        versions = routes_inspector.VersionAPIController({'v1': ROUTER})
+        first, remainder = versions._lookup('v1')
+        second, remainder = versions._lookup('v1')
+        self.assertIs(first, second)
+
+
+class TestRenderDocstrings(unittest.TestCase):
+
+    def test_workers(self):
+        routes_inspector.DOCSTRING_CACHE.clear()
+        controller = ServersController()
+        actions = [(controller, 'show'), (controller, 'delete'),
+                   (controller, 'index')]
+        parallel = routes_inspector.render_docstrings(actions, workers=2)
+        routes_inspector.DOCSTRING_CACHE.clear()
+        serial = routes_inspector.render_docstrings(actions)
+        self.assertEqual(parallel, serial)
+        self.assertIsNone(serial[1])
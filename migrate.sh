@@ -98,9 +98,11 @@ function migrate_docbkx {
       mkdir api_doc
     fi
 
-    ${wrapper} find api-site/api-ref/src/docbkx/ -name api-ref-\* -type f -exec fairy-slipper-docbkx-to-json -o conversion_files -v {} \;
-    ${wrapper} find conversion_files -name api-ref\*json -type f -exec fairy-slipper-wadl-to-swagger -o conversion_files -v {} \;
-    ${wrapper} find conversion_files -name \*-swagger.json -type f -exec fairy-slipper-swagger-to-rst -o api_doc -v {} \;
+    # Only the books whose inputs changed since the last run are
+    # converted again, remove the manifest to convert everything.  Add
+    # --intermediate-dir conversion_files to keep the api-ref and
+    # swagger files for debugging.
+    ${wrapper} fairy-slipper-build --manifest conversion_files/manifest.json --examples-dir conversion_files -o api_doc -v api-site
 }
 
 install_fairy_slipper